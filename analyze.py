@@ -1,48 +1,170 @@
 """
 Main experiment runner using inspect_ai pipeline.
+
+Settings come from DEFAULT_CONFIG, optionally overridden by a JSON/YAML
+config file (--config) and then by individual CLI flags. Run
+``python analyze.py --help`` for the full list.
 """
 
-import matplotlib.pyplot as plt
+import argparse
+import time
+import llm_client
 from pipeline.experiment import run_sequential_experiment, run_parallel_experiment, calculate_metrics
 from pipeline.dataset import create_experiment_dataset
 from pipeline.utils import save_results
+from pipeline.config import resolve_config, write_run_manifest, OUTPUT_FORMATS, SCORING_MODES, GROUND_TRUTH_MODES
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """
+    Parse command line arguments.
+
+    Flags default to None so that only flags given explicitly override
+    the config file.
+
+    Args:
+        argv: Argument list (default: sys.argv[1:])
+
+    Returns:
+        Parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Run the self-sycophancy experiment.")
+    parser.add_argument("--config", help="Path to a JSON or YAML config file")
+
+    concurrency = parser.add_argument_group("concurrency")
+    mode = concurrency.add_mutually_exclusive_group()
+    mode.add_argument("--parallel", dest="parallel", action="store_true", default=None,
+                      help="Process issues with a worker pool")
+    mode.add_argument("--sequential", dest="parallel", action="store_false",
+                      help="Process issues one at a time")
+    concurrency.add_argument("--max-workers", type=int, help="Maximum parallel workers")
+    concurrency.add_argument("--requests-per-minute", type=float,
+                             help="Maximum API requests per minute across all workers")
+
+    models = parser.add_argument_group("models")
+    models.add_argument("--generator-model", help="Model that writes the PRs")
+    models.add_argument("--judge-model", help="Model that rates the PRs")
+    models.add_argument("--backend", dest="default_backend",
+                        help="Backend for models without an explicit mapping (e.g. openrouter, fake)")
+    models.add_argument("--model-backend", action="append", metavar="MODEL=BACKEND",
+                        help="Serve MODEL from BACKEND (repeatable)")
+
+    scoring = parser.add_argument_group("scoring")
+    scoring.add_argument("--scoring-mode", choices=SCORING_MODES,
+                         help="sync: judge calls per request; batch: one offline batch API job")
+    scoring.add_argument("--batch-api", dest="batch_api_type", choices=["openai", "local"],
+                         help="Batch API for --scoring-mode batch (local is a file-based stand-in)")
 
+    evaluation = parser.add_argument_group("ground truth")
+    evaluation.add_argument("--ground-truth", choices=GROUND_TRUTH_MODES,
+                            help="random: seeded coin flip; swebench: run each instance's tests on the generated diff")
+    evaluation.add_argument("--eval-workers", type=int, help="Test evaluation worker processes")
+    evaluation.add_argument("--repos-dir", help="Directory of pre-fetched repo mirrors (owner__name)")
+    evaluation.add_argument("--wheelhouse", help="Directory of wheels for offline environment builds")
 
-def main():
+    sampling = parser.add_argument_group("sampling")
+    sampling.add_argument("--temperature", type=float, help="Sampling temperature")
+    sampling.add_argument("--max-tokens", type=int, help="Maximum tokens per judge completion")
+    sampling.add_argument("--generator-max-tokens", type=int, help="Maximum tokens per generated PR (title, body and diff)")
+    sampling.add_argument("--seed", type=int,
+                          help="Run seed; derives per-issue seeds for generation, judging and ground truth")
+    sampling.add_argument("--min-samples-per-issue", type=int, help="Paired rating samples before stopping is checked")
+    sampling.add_argument("--max-samples-per-issue", type=int, help="Maximum paired rating samples per issue")
+    sampling.add_argument("--issue-ci-half-width", type=float,
+                          help="Stop sampling an issue once the CI half-width on its self_other_diff is this small")
+    sampling.add_argument("--run-ci-half-width", type=float,
+                          help="Stop the run once the CI half-width on mean self_other_diff is this small")
+    sampling.add_argument("--min-issues", type=int, help="Issues to rate before the run may stop early")
+    sampling.add_argument("--confidence", type=float, help="Confidence level for the stopping rules")
+
+    data = parser.add_argument_group("dataset")
+    data.add_argument("--n-issues", type=int, help="Number of issues to process")
+    data.add_argument("--dataset-name", help="Hugging Face dataset name")
+    data.add_argument("--dataset-split", help="Dataset split")
+    data.add_argument("--dataset-revision", help="Dataset revision (tag, branch or commit) to pin")
+
+    outputs = parser.add_argument_group("outputs")
+    outputs.add_argument("--results-dir", help="Directory for all outputs")
+    outputs.add_argument("--output-formats", nargs="+", choices=OUTPUT_FORMATS,
+                         help="Outputs to write")
+
+    args = parser.parse_args(argv)
+    if args.model_backend:
+        pairs = [item.split("=", 1) for item in args.model_backend]
+        if any(len(pair) != 2 for pair in pairs):
+            parser.error("--model-backend expects MODEL=BACKEND")
+        args.model_backend = dict(pairs)
+    return args
+
+
+def main(argv=None):
     """Main function to run the experiment."""
+    args = parse_args(argv)
+    swebench_flags = {"eval_workers": "workers", "repos_dir": "repos_dir", "wheelhouse": "wheelhouse"}
+    overrides = {key: value for key, value in vars(args).items()
+                 if key not in ("config", "model_backend", "batch_api_type", *swebench_flags)}
+    if args.batch_api_type:
+        overrides["batch_api"] = {"type": args.batch_api_type}
+    swebench = {key: getattr(args, flag) for flag, key in swebench_flags.items() if getattr(args, flag) is not None}
+    if swebench:
+        overrides["swebench"] = swebench
+    config = resolve_config(args.config, overrides)
+    if args.model_backend:
+        config["model_backends"] = {**config["model_backends"], **args.model_backend}
+
     print("Starting self-sycophancy experiment with inspect_ai pipeline...")
 
-    # Simple configuration
-    USE_PARALLEL = True  # Set to False for sequential processing
-    N_ISSUES = 20  # Increased to 20 for more comprehensive results
-    MAX_PARALLEL_WORKERS = 1  # Single worker to avoid rate limiting
-    RESULTS_DIR = "results"  # All outputs go to results folder
+    llm_client.configure_backends(config["backends"], config["model_backends"], config["default_backend"])
+    llm_client.set_rate_limit(config["requests_per_minute"])
+    llm_client.reset_call_stats()
+
+    n_issues = config["n_issues"]
+    max_workers = config["max_workers"]
+    results_dir = config["results_dir"]
+    formats = config["output_formats"]
 
     try:
-        if USE_PARALLEL:
-            print(f"Running parallel experiment with {N_ISSUES} issues (max {MAX_PARALLEL_WORKERS} workers)...")
-            results_df = run_parallel_experiment(n_issues=N_ISSUES, max_workers=MAX_PARALLEL_WORKERS)
+        run_start = time.perf_counter()
+        if config["parallel"]:
+            print(f"Running parallel experiment with {n_issues} issues (max {max_workers} workers)...")
+            results_df = run_parallel_experiment(n_issues=n_issues, max_workers=max_workers, config=config)
         else:
-            print(f"Running sequential experiment with {N_ISSUES} issues...")
-            results_df = run_sequential_experiment(n_issues=N_ISSUES)
+            print(f"Running sequential experiment with {n_issues} issues...")
+            results_df = run_sequential_experiment(n_issues=n_issues, config=config)
+        timings = {**results_df.attrs.get("timings", {}), "run": time.perf_counter() - run_start}
 
         # Calculate metrics
         metrics = calculate_metrics(results_df)
 
         # Save basic results to results folder
-        save_results(results_df, metrics, RESULTS_DIR)
+        save_start = time.perf_counter()
+        outputs = save_results(results_df, metrics, results_dir, formats)
 
         # Create comprehensive datasets using inspect_ai framework
-        print("\nCreating comprehensive datasets...")
-        dataset_info = create_experiment_dataset(results_df.to_dict('records'), RESULTS_DIR)
+        dataset_info = {}
+        if "inspect_ai" in formats:
+            print("\nCreating comprehensive datasets...")
+            dataset_info = create_experiment_dataset(results_df, results_dir)
+            outputs.extend(dataset_info.values())
+        timings["save"] = time.perf_counter() - save_start
+        timings["total"] = time.perf_counter() - run_start
+
+        write_run_manifest(config, results_df.attrs.get("dataset", {}), timings,
+                           llm_client.get_call_stats(), metrics, outputs,
+                           sampling=results_df.attrs.get("sampling"),
+                           evaluation=results_df.attrs.get("evaluation"),
+                           backends={
+                               "generator": llm_client.get_backend(config["generator_model"]).capabilities(),
+                               "judge": llm_client.get_backend(config["judge_model"]).capabilities()
+                           })
 
         print("\nExperiment completed successfully!")
-        if USE_PARALLEL:
-            print(f"Parallel processing completed with {MAX_PARALLEL_WORKERS} workers")
+        if config["parallel"]:
+            print(f"Parallel processing completed with {max_workers} workers")
         else:
             print(f"Sequential processing completed")
         print(f"Datasets available: {len(dataset_info)} formats")
-        print(f"All results saved to: {RESULTS_DIR}/ folder")
+        print(f"All results saved to: {results_dir}/ folder")
 
     except Exception as e:
         print(f"Error running experiment: {e}")
@@ -1,6 +1,12 @@
+import hashlib
+import inspect
 import os
+import threading
+import time
 import requests
-from typing import Optional
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Union
 
 # Try to load .env file if python-dotenv is available
 try:
@@ -10,13 +16,443 @@ except ImportError:
     pass
 
 
-def call_model(prompt: str, model: str = "google/gemma-2-9b-it:free") -> str:
+# Shared across threads so parallel workers respect a single request budget
+_rate_lock = threading.Lock()
+_min_interval = 0.0
+_next_request_time = 0.0
+
+_stats_lock = threading.Lock()
+_call_latencies = []
+_call_errors = 0
+
+
+def set_rate_limit(requests_per_minute: Optional[float]):
+    """
+    Limit the rate of requests to rate-limited (public API) backends across all threads.
+    
+    Args:
+        requests_per_minute: Maximum requests per minute (None disables limiting)
+    """
+    global _min_interval, _next_request_time
+    with _rate_lock:
+        _min_interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        _next_request_time = 0.0
+
+
+def _wait_for_rate_limit():
+    """Block until the next request is allowed by the rate limit."""
+    global _next_request_time
+    if not _min_interval:
+        return
+    with _rate_lock:
+        now = time.monotonic()
+        start = max(now, _next_request_time)
+        _next_request_time = start + _min_interval
+    if start > now:
+        time.sleep(start - now)
+
+
+def get_call_stats() -> Dict:
+    """
+    Get latency statistics for API calls made since the last reset.
+    
+    Returns:
+        Dictionary with call count, error count and latency percentiles (seconds)
+    """
+    with _stats_lock:
+        latencies = sorted(_call_latencies)
+        errors = _call_errors
+    
+    if not latencies:
+        return {"calls": 0, "errors": errors}
+    
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+    
+    return {
+        "calls": len(latencies),
+        "errors": errors,
+        "total_seconds": sum(latencies),
+        "mean_seconds": sum(latencies) / len(latencies),
+        "p50_seconds": percentile(0.5),
+        "p95_seconds": percentile(0.95),
+        "max_seconds": latencies[-1]
+    }
+
+
+def reset_call_stats():
+    """Clear recorded API call statistics."""
+    global _call_errors
+    with _stats_lock:
+        _call_latencies.clear()
+        _call_errors = 0
+
+
+def _record_call(latency: float, error: bool):
+    """Record the latency and outcome of a single API call."""
+    global _call_errors
+    with _stats_lock:
+        _call_latencies.append(latency)
+        if error:
+            _call_errors += 1
+
+
+class Backend(ABC):
+    """
+    Base class for model backends.
+    
+    Subclasses implement complete() and declare what they support through the
+    capability attributes so callers can pick the fastest path per model.
+    """
+    
+    supports_batching = False
+    supports_logprobs = False
+    supports_streaming = False
+    rate_limited = False
+    
+    def __init__(self, name: str):
+        self.name = name
+    
+    def capabilities(self) -> Dict:
+        """
+        Describe what this backend supports.
+        
+        Returns:
+            Dictionary of backend name, type and capability flags
+        """
+        return {
+            "name": self.name,
+            "type": type(self).__name__,
+            "batching": self.supports_batching,
+            "logprobs": self.supports_logprobs,
+            "streaming": self.supports_streaming,
+            "rate_limited": self.rate_limited
+        }
+    
+    @abstractmethod
+    def complete(self, prompt: str, model: str, temperature: float, max_tokens: int,
+                 seed: Optional[int] = None) -> str:
+        """
+        Generate a completion for a single prompt.
+        
+        Args:
+            prompt: Input text prompt
+            model: Model identifier
+            temperature: Sampling temperature
+            max_tokens: Maximum tokens to generate
+            seed: Sampling seed (None for unseeded sampling)
+        
+        Returns:
+            Model's text output
+        """
+    
+    def _complete_one(self, prompt: str, model: str, temperature: float, max_tokens: int,
+                      seed: Optional[int], return_exceptions: bool) -> Union[str, Exception]:
+        """Complete one prompt of a batch, returning its exception instead of raising if asked to."""
+        try:
+            return self.complete(prompt, model, temperature, max_tokens, seed)
+        except Exception as e:
+            if not return_exceptions:
+                raise
+            return e
+    
+    def complete_batch(self, prompts: List[str], model: str, temperature: float, max_tokens: int,
+                       seeds: Optional[List[Optional[int]]] = None,
+                       return_exceptions: bool = False) -> List[Union[str, Exception]]:
+        """
+        Generate completions for several prompts, in order.
+        
+        Args:
+            prompts: Input text prompts
+            model: Model identifier
+            temperature: Sampling temperature
+            max_tokens: Maximum tokens to generate
+            seeds: Sampling seed per prompt (None for unseeded sampling)
+            return_exceptions: Put a failed prompt's exception in its place
+                instead of raising, so the other completions are kept
+        
+        Returns:
+            Model text outputs (or exceptions), one per prompt
+        """
+        seeds = seeds or [None] * len(prompts)
+        return [self._complete_one(prompt, model, temperature, max_tokens, seed, return_exceptions)
+                for prompt, seed in zip(prompts, seeds)]
+
+
+class OpenAICompatibleBackend(Backend):
+    """
+    Backend for any server exposing the OpenAI chat completions API
+    (vLLM, llama.cpp server, text-generation-inference, ...).
+    
+    Batches are sent as concurrent requests so the server can batch them
+    continuously; local servers are not subject to the shared rate limit.
+    """
+    
+    supports_batching = True
+    supports_logprobs = True
+    supports_streaming = True
+    
+    def __init__(self, base_url: str, api_key_env: Optional[str] = None, name: str = "openai_compatible",
+                 headers: Optional[Dict] = None, rate_limited: bool = False, max_batch_workers: int = 8):
+        super().__init__(name)
+        self.base_url = base_url.rstrip("/")
+        self.api_key_env = api_key_env
+        self.headers = headers or {}
+        self.rate_limited = rate_limited
+        self.max_batch_workers = max_batch_workers
+    
+    def _build_headers(self) -> Dict:
+        """Build request headers, including the API key if one is configured."""
+        headers = {"Content-Type": "application/json", **self.headers}
+        if self.api_key_env:
+            api_key = os.getenv(self.api_key_env)
+            if not api_key:
+                raise ValueError(f"{self.api_key_env} environment variable not set. Please set it in your environment or create a .env file.")
+            headers["Authorization"] = f"Bearer {api_key}"
+        return headers
+    
+    def complete(self, prompt: str, model: str, temperature: float, max_tokens: int,
+                 seed: Optional[int] = None) -> str:
+        """
+        Call the chat completions endpoint.
+        
+        Raises:
+            ValueError: If the API key is not found or the response is malformed
+            requests.RequestException: If API call fails
+        """
+        headers = self._build_headers()
+        url = f"{self.base_url}/chat/completions"
+        
+        data = {
+            "model": model,
+            "messages": [{"role": "user", "content": prompt}],
+            "max_tokens": max_tokens,
+            "temperature": temperature
+        }
+        if seed is not None:
+            data["seed"] = seed
+        
+        if self.rate_limited:
+            _wait_for_rate_limit()
+        start = time.monotonic()
+        error = False
+        try:
+            response = requests.post(url, headers=headers, json=data)
+            
+            # Print response details for debugging
+            if response.status_code != 200:
+                print(f"API Error: {response.status_code}")
+                print(f"Response: {response.text}")
+                response.raise_for_status()
+            
+            response_data = response.json()
+            
+            # Check if response has the expected structure
+            if "choices" not in response_data or not response_data["choices"]:
+                raise ValueError(f"Unexpected API response format: {response_data}")
+            
+            return response_data["choices"][0]["message"]["content"]
+            
+        except requests.exceptions.HTTPError as e:
+            error = True
+            print(f"HTTP Error: {e}")
+            print(f"Response: {e.response.text if e.response else 'No response'}")
+            raise
+        except Exception as e:
+            error = True
+            print(f"Error calling {self.name} API: {e}")
+            raise
+        finally:
+            _record_call(time.monotonic() - start, error)
+    
+    def complete_batch(self, prompts: List[str], model: str, temperature: float, max_tokens: int,
+                       seeds: Optional[List[Optional[int]]] = None,
+                       return_exceptions: bool = False) -> List[Union[str, Exception]]:
+        """Send the prompts concurrently and return completions in order."""
+        seeds = seeds or [None] * len(prompts)
+        with ThreadPoolExecutor(max_workers=self.max_batch_workers) as executor:
+            return list(executor.map(
+                lambda prompt, seed: self._complete_one(prompt, model, temperature, max_tokens, seed,
+                                                        return_exceptions),
+                prompts, seeds
+            ))
+
+
+class OpenRouterBackend(OpenAICompatibleBackend):
+    """
+    Backend for the public OpenRouter API.
+    
+    Requests count against the shared rate limit and are sent one at a time,
+    since concurrency only burns through the account quota faster.
+    """
+    
+    supports_batching = False
+    supports_logprobs = False
+    
+    def __init__(self, name: str = "openrouter"):
+        super().__init__(
+            "https://openrouter.ai/api/v1",
+            api_key_env="OPENROUTER_API_KEY",
+            name=name,
+            headers={
+                "HTTP-Referer": "http://localhost:3000",  # Required by OpenRouter
+                "X-Title": "Self-Sycophancy-Experiment"  # Optional but helpful
+            },
+            rate_limited=True
+        )
+    
+    def complete_batch(self, prompts: List[str], model: str, temperature: float, max_tokens: int,
+                       seeds: Optional[List[Optional[int]]] = None,
+                       return_exceptions: bool = False) -> List[Union[str, Exception]]:
+        """Send the prompts sequentially."""
+        return Backend.complete_batch(self, prompts, model, temperature, max_tokens, seeds, return_exceptions)
+
+
+class FakeBackend(Backend):
     """
-    Call OpenRouter API to get model response.
+    In-process deterministic backend for dry runs and tests.
+    
+    The same (model, prompt, seed) always produces the same response and no
+    network calls are made. Unseeded calls behave as if seeded with 0. Rating prompts get a 0-10 number; all other
+    prompts get a PR in the format generate_pr() expects.
+    """
+    
+    supports_batching = True
+    
+    def __init__(self, name: str = "fake", responder: Optional[Callable[[str, str, Optional[int]], str]] = None):
+        super().__init__(name)
+        self.responder = responder or self._default_response
+    
+    @staticmethod
+    def _default_response(prompt: str, model: str, seed: Optional[int]) -> str:
+        """Derive a deterministic response from a hash of the model, prompt and seed."""
+        key = f"{model}\0{prompt}" if not seed else f"{model}\0{prompt}\0{seed}"
+        digest = int(hashlib.sha256(key.encode("utf-8")).hexdigest(), 16)
+        if "Respond with just the number" in prompt:
+            return str(digest % 11)
+        return (f"- Title: Fix {digest % 10000:04d}\n"
+                f"- Body: Deterministic fake PR from {model}\n"
+                f"- Diff: +# fake change {digest % 10000:04d}")
+    
+    def complete(self, prompt: str, model: str, temperature: float, max_tokens: int,
+                 seed: Optional[int] = None) -> str:
+        """Return the deterministic response for this prompt and seed."""
+        start = time.monotonic()
+        response = self.responder(prompt, model, seed)
+        _record_call(time.monotonic() - start, False)
+        return response
+
+
+BACKEND_TYPES = {
+    "openrouter": OpenRouterBackend,
+    "openai_compatible": OpenAICompatibleBackend,
+    "fake": FakeBackend
+}
+
+_backends = {"openrouter": OpenRouterBackend(), "fake": FakeBackend()}
+_model_backends = {}
+_default_backend = "openrouter"
+
+
+def create_backend(name: str, spec: Dict) -> Backend:
+    """
+    Create a backend from a config entry.
+    
+    Args:
+        name: Name to register the backend under
+        spec: Dictionary with "type" (openrouter, openai_compatible or fake)
+            plus that type's constructor arguments, e.g. base_url and api_key_env
+    
+    Returns:
+        Backend instance
+    
+    Raises:
+        ValueError: If the backend type is unknown, or a setting is unknown
+            or missing for that type
+    """
+    spec = dict(spec)
+    backend_type = spec.pop("type", "openai_compatible")
+    if backend_type not in BACKEND_TYPES:
+        raise ValueError(f"Unknown backend type: {backend_type} (choose from {', '.join(BACKEND_TYPES)})")
+    parameters = {key: parameter for key, parameter in inspect.signature(BACKEND_TYPES[backend_type]).parameters.items()
+                  if key != "name"}
+    unknown = sorted(set(spec) - set(parameters))
+    if unknown:
+        raise ValueError(f"Unknown settings for {backend_type} backend {name}: {', '.join(unknown)} "
+                         f"(choose from {', '.join(['type', *parameters])})")
+    missing = [key for key, parameter in parameters.items()
+               if parameter.default is inspect.Parameter.empty and key not in spec]
+    if missing:
+        raise ValueError(f"Missing settings for {backend_type} backend {name}: {', '.join(missing)}")
+    return BACKEND_TYPES[backend_type](name=name, **spec)
+
+
+def register_backend(name: str, backend: Backend):
+    """
+    Register a backend instance under a name.
+    
+    Args:
+        name: Backend name used in model routing
+        backend: Backend instance
+    """
+    _backends[name] = backend
+
+
+def configure_backends(backends: Optional[Dict] = None, model_backends: Optional[Dict] = None,
+                       default_backend: Optional[str] = None):
+    """
+    Configure backends and which backend serves each model.
+    
+    Args:
+        backends: Mapping of backend name to spec (see create_backend)
+        model_backends: Mapping of model identifier to backend name
+        default_backend: Backend for models without an explicit mapping
+    
+    Raises:
+        ValueError: If a model is routed to an unknown backend
+    """
+    global _default_backend
+    for name, spec in (backends or {}).items():
+        register_backend(name, create_backend(name, spec))
+    
+    routes = dict(model_backends or {})
+    if default_backend:
+        routes[None] = default_backend
+    unknown = sorted(set(routes.values()) - set(_backends))
+    if unknown:
+        raise ValueError(f"Unknown backends: {', '.join(unknown)}")
+    
+    if model_backends:
+        _model_backends.update(model_backends)
+    if default_backend:
+        _default_backend = default_backend
+
+
+def get_backend(model: str) -> Backend:
+    """
+    Get the backend that serves a model.
+    
+    Args:
+        model: Model identifier
+    
+    Returns:
+        Backend instance
+    """
+    return _backends[_model_backends.get(model, _default_backend)]
+
+
+def call_model(prompt: str, model: str = "google/gemma-2-9b-it:free",
+               temperature: float = 0.7, max_tokens: int = 500, seed: Optional[int] = None) -> str:
+    """
+    Call the model's backend to get a response (OpenRouter by default).
     
     Args:
         prompt: Input text prompt
         model: Model identifier (default: google/gemma-2-9b-it:free)
+        temperature: Sampling temperature (default: 0.7)
+        max_tokens: Maximum tokens to generate (default: 500)
+        seed: Sampling seed for reproducible outputs, where the backend
+            supports it (default: None, unseeded)
     
     Returns:
         Model's text output
@@ -25,46 +461,30 @@ def call_model(prompt: str, model: str = "google/gemma-2-9b-it:free") -> str:
         ValueError: If API key not found
         requests.RequestException: If API call fails
     """
-    api_key = os.getenv("OPENROUTER_API_KEY")
-    if not api_key:
-        raise ValueError("OPENROUTER_API_KEY environment variable not set. Please set it in your environment or create a .env file.")
-    
-    url = "https://openrouter.ai/api/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-        "HTTP-Referer": "http://localhost:3000",  # Required by OpenRouter
-        "X-Title": "Self-Sycophancy-Experiment"  # Optional but helpful
-    }
+    return get_backend(model).complete(prompt, model, temperature, max_tokens, seed)
+
+
+def call_model_batch(prompts: List[str], model: str = "google/gemma-2-9b-it:free",
+                     temperature: float = 0.7, max_tokens: int = 500,
+                     seeds: Optional[List[Optional[int]]] = None,
+                     return_exceptions: bool = False) -> List[Union[str, Exception]]:
+    """
+    Call the model's backend for several prompts at once.
     
-    data = {
-        "model": model,
-        "messages": [{"role": "user", "content": prompt}],
-        "max_tokens": 500,
-        "temperature": 0.7
-    }
+    Args:
+        prompts: Input text prompts
+        model: Model identifier (default: google/gemma-2-9b-it:free)
+        temperature: Sampling temperature (default: 0.7)
+        max_tokens: Maximum tokens to generate (default: 500)
+        seeds: Sampling seed per prompt (default: None, unseeded)
+        return_exceptions: Return a failed prompt's exception in its place
+            instead of raising (default: False)
     
-    try:
-        response = requests.post(url, headers=headers, json=data)
-        
-        # Print response details for debugging
-        if response.status_code != 200:
-            print(f"API Error: {response.status_code}")
-            print(f"Response: {response.text}")
-            response.raise_for_status()
-        
-        response_data = response.json()
-        
-        # Check if response has the expected structure
-        if "choices" not in response_data or not response_data["choices"]:
-            raise ValueError(f"Unexpected API response format: {response_data}")
-        
-        return response_data["choices"][0]["message"]["content"]
+    Returns:
+        Model text outputs (or exceptions), one per prompt
         
-    except requests.exceptions.HTTPError as e:
-        print(f"HTTP Error: {e}")
-        print(f"Response: {e.response.text if e.response else 'No response'}")
-        raise
-    except Exception as e:
-        print(f"Error calling OpenRouter API: {e}")
-        raise
+    Raises:
+        ValueError: If API key not found
+        requests.RequestException: If any API call fails (unless return_exceptions)
+    """
+    return get_backend(model).complete_batch(prompts, model, temperature, max_tokens, seeds, return_exceptions)
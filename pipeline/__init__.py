@@ -6,6 +6,11 @@ from .task import create_pr_evaluation_task, create_pr_generation_task
 from .scorer import score_pr, generate_pr, score_prs_batch
 from .dataset import create_experiment_dataset, create_task_dataset
 from .utils import save_results, ensure_directory, get_timestamp
+from .config import DEFAULT_CONFIG, resolve_config, write_run_manifest
+from .batch import score_results_offline, OpenAIBatchClient, LocalBatchClient
+from .analysis import RatingStats, ResultsStore
+from .records import ResultRecord, ResultColumns
+from .evaluation import GroundTruthEvaluator, evaluate_instance
 
 __all__ = [
     'create_pr_evaluation_task',
@@ -17,5 +22,17 @@ __all__ = [
     'create_task_dataset',
     'save_results',
     'ensure_directory',
-    'get_timestamp'
+    'get_timestamp',
+    'DEFAULT_CONFIG',
+    'resolve_config',
+    'write_run_manifest',
+    'score_results_offline',
+    'OpenAIBatchClient',
+    'LocalBatchClient',
+    'RatingStats',
+    'ResultsStore',
+    'ResultRecord',
+    'ResultColumns',
+    'GroundTruthEvaluator',
+    'evaluate_instance'
 ]
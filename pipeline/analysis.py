@@ -0,0 +1,509 @@
+"""
+Incremental analysis over experiment result files.
+
+Each run's rows are folded into mergeable aggregate state (counts, means and
+co-moments of the rating columns) per run and per repo. Metrics are
+derived from that state, so new rows or runs only cost the work to read the
+new rows, and re-deriving dashboard metrics over hundreds of historical runs
+only merges small cached states.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .utils import ensure_directory
+
+
+# Columns tracked by RatingStats, in co-moment matrix order
+STAT_FIELDS = ["rating_self", "rating_other", "self_other_diff", "ground_truth"]
+
+# Columns read from result files (self_other_diff is recomputed)
+SOURCE_COLUMNS = ["issue_id", "rating_self", "rating_other", "ground_truth"]
+
+# Bytes of already-consumed JSONL prefix hashed to detect rewritten files
+_PREFIX_CHECK_BYTES = 4096
+
+
+class RatingStats:
+    """
+    Mergeable summary of rating columns.
+
+    Missing values are handled like pandas: means and variances use each
+    column's own non-missing values and correlations use the rows where both
+    columns are present. For every pair of tracked columns (i, j) the stats
+    hold the number of rows with both values (pair_count), the mean of i
+    over those rows (pair_mean), the sum of squared deviations of i over
+    those rows (pair_m2) and the co-moment of i and j (comoment). The
+    diagonal holds the per-column count, mean and sum of squared deviations.
+    Two summaries merge exactly (Chan et al.), so stats can be updated one
+    batch of rows at a time and combined across runs or repos.
+    """
+
+    def __init__(self):
+        size = len(STAT_FIELDS)
+        self.count = 0
+        self.pair_count = np.zeros((size, size))
+        self.pair_mean = np.zeros((size, size))
+        self.pair_m2 = np.zeros((size, size))
+        self.comoment = np.zeros((size, size))
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "RatingStats":
+        """
+        Build stats from a results DataFrame.
+
+        Args:
+            df: DataFrame with rating_self, rating_other and ground_truth columns
+
+        Returns:
+            RatingStats for the rows of df
+        """
+        stats = cls()
+        stats.update(df)
+        return stats
+
+    def update(self, df: pd.DataFrame):
+        """
+        Fold a batch of result rows into the stats.
+
+        Args:
+            df: DataFrame with rating_self, rating_other and ground_truth columns
+        """
+        self.update_arrays(
+            df["rating_self"].to_numpy(dtype=float),
+            df["rating_other"].to_numpy(dtype=float),
+            df["ground_truth"].to_numpy(dtype=float)
+        )
+
+    @classmethod
+    def from_arrays(cls, rating_self, rating_other, ground_truth) -> "RatingStats":
+        """
+        Build stats from rating and ground truth columns.
+
+        Args:
+            rating_self: Sequence or buffer of self ratings
+            rating_other: Sequence or buffer of other ratings
+            ground_truth: Sequence or buffer of ground truth labels
+
+        Returns:
+            RatingStats for the rows
+        """
+        stats = cls()
+        stats.update_arrays(rating_self, rating_other, ground_truth)
+        return stats
+
+    def update_arrays(self, rating_self, rating_other, ground_truth):
+        """
+        Fold rating and ground truth columns into the stats.
+
+        Missing values (NaN) are left out of the statistics they affect; the
+        row itself still counts towards total_issues.
+
+        Args:
+            rating_self: Sequence or buffer of self ratings
+            rating_other: Sequence or buffer of other ratings
+            ground_truth: Sequence or buffer of ground truth labels
+        """
+        rating_self = np.asarray(rating_self, dtype=float)
+        rating_other = np.asarray(rating_other, dtype=float)
+        if not len(rating_self):
+            return
+        values = np.column_stack([
+            rating_self,
+            rating_other,
+            rating_self - rating_other,
+            np.asarray(ground_truth, dtype=float)
+        ])
+        present = ~np.isnan(values)
+
+        batch = RatingStats()
+        batch.count = len(values)
+        for i in range(len(STAT_FIELDS)):
+            for j in range(len(STAT_FIELDS)):
+                rows = present[:, i] & present[:, j]
+                n = int(rows.sum())
+                if not n:
+                    continue
+                x, y = values[rows, i], values[rows, j]
+                batch.pair_count[i, j] = n
+                batch.pair_mean[i, j] = x.mean()
+                batch.pair_m2[i, j] = ((x - x.mean()) ** 2).sum()
+                batch.comoment[i, j] = ((x - x.mean()) * (y - y.mean())).sum()
+        self.merge(batch)
+
+    def merge(self, other: "RatingStats") -> "RatingStats":
+        """
+        Merge another summary into this one.
+
+        Args:
+            other: Stats to merge
+
+        Returns:
+            self
+        """
+        if not other.count:
+            return self
+
+        n_a, n_b = self.pair_count, other.pair_count
+        total = n_a + n_b
+        safe_total = np.where(total > 0, total, 1)
+        delta = other.pair_mean - self.pair_mean
+        weight = n_a * n_b / safe_total
+        self.comoment = self.comoment + other.comoment + delta * delta.T * weight
+        self.pair_m2 = self.pair_m2 + other.pair_m2 + delta ** 2 * weight
+        self.pair_mean = np.where(total > 0, (n_a * self.pair_mean + n_b * other.pair_mean) / safe_total, 0.0)
+        self.pair_count = total
+        self.count += other.count
+        return self
+
+    def column_count(self, field: str) -> int:
+        """Number of non-missing values of a tracked column."""
+        i = STAT_FIELDS.index(field)
+        return int(self.pair_count[i, i])
+
+    def _mean(self, field: str) -> float:
+        """Mean of a tracked column over its non-missing values (NaN if none)."""
+        i = STAT_FIELDS.index(field)
+        return float(self.pair_mean[i, i]) if self.pair_count[i, i] else float("nan")
+
+    def _correlation(self, a: str, b: str) -> float:
+        """Pearson correlation over rows with both columns present (NaN if undefined)."""
+        i, j = STAT_FIELDS.index(a), STAT_FIELDS.index(b)
+        denominator = np.sqrt(self.pair_m2[i, j] * self.pair_m2[j, i])
+        return float(self.comoment[i, j] / denominator) if denominator > 0 else float("nan")
+
+    def metrics(self) -> Dict:
+        """
+        Calculate experiment metrics from the aggregate state.
+
+        Returns:
+            Dictionary with the same keys (and values) as calculate_metrics(),
+            plus the standard deviation and standard error of self_other_diff
+        """
+        diff_index = STAT_FIELDS.index("self_other_diff")
+        n_diff = self.pair_count[diff_index, diff_index]
+        variance = self.pair_m2[diff_index, diff_index] / (n_diff - 1) if n_diff > 1 else float("nan")
+        return {
+            "mean_self": self._mean("rating_self"),
+            "mean_other": self._mean("rating_other"),
+            "mean_self_other_diff": self._mean("self_other_diff"),
+            "correlation_self_ground_truth": self._correlation("rating_self", "ground_truth"),
+            "correlation_other_ground_truth": self._correlation("rating_other", "ground_truth"),
+            "total_issues": self.count,
+            "std_self_other_diff": float(np.sqrt(variance)),
+            "se_self_other_diff": float(np.sqrt(variance / n_diff)) if n_diff else float("nan")
+        }
+
+    def to_dict(self) -> Dict:
+        """Serialize to a JSON-compatible dictionary."""
+        return {
+            "count": self.count,
+            "pair_count": self.pair_count.tolist(),
+            "pair_mean": self.pair_mean.tolist(),
+            "pair_m2": self.pair_m2.tolist(),
+            "comoment": self.comoment.tolist()
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "RatingStats":
+        """Restore stats serialized with to_dict()."""
+        stats = cls()
+        stats.count = data["count"]
+        for name in ("pair_count", "pair_mean", "pair_m2", "comoment"):
+            setattr(stats, name, np.array(data[name], dtype=float))
+        return stats
+
+
+def repo_from_issue_id(issue_id: str) -> str:
+    """
+    Derive the repository from a SWE-bench instance id.
+
+    Args:
+        issue_id: Instance id such as "astropy__astropy-11693"
+
+    Returns:
+        Repository such as "astropy/astropy" ("unknown-repo" if not derivable)
+    """
+    if "__" not in issue_id:
+        return "unknown-repo"
+    owner, rest = issue_id.split("__", 1)
+    return f"{owner}/{rest.rsplit('-', 1)[0]}"
+
+
+def _with_repo(df: pd.DataFrame) -> pd.DataFrame:
+    """Ensure a results chunk has a repo column."""
+    if "repo" not in df.columns:
+        df = df.assign(repo=df["issue_id"].astype(str).map(repo_from_issue_id))
+    return df
+
+
+def read_result_chunks(path: str, offset: int = 0, chunksize: int = 100_000,
+                       end: Optional[int] = None) -> Iterator[pd.DataFrame]:
+    """
+    Lazily read the columns needed for analysis from a results file.
+
+    JSONL files are memory-mapped and streamed line by line from a byte
+    offset, so rows appended since the last read are consumed without
+    rereading (or copying) the rest of the file; only complete lines are
+    read. Parquet files are memory-mapped and read column-wise (requires
+    pyarrow). CSV files are read in chunks.
+
+    Args:
+        path: Path to a .jsonl, .parquet or .csv results file
+        offset: Byte offset to start from (JSONL only)
+        chunksize: Rows per chunk (CSV and JSONL)
+        end: Byte offset to stop at, on a line boundary (JSONL only;
+            default: the end of the last complete line)
+
+    Yields:
+        DataFrame chunks with the analysis columns (plus repo if present)
+
+    Raises:
+        ValueError: If the file format is unsupported
+    """
+    if path.endswith(".jsonl"):
+        if end is None:
+            end = _jsonl_complete_size(path)
+        if end <= offset:
+            return
+        wanted = SOURCE_COLUMNS + ["repo"]
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            mapped.seek(offset)
+            rows = []
+            while mapped.tell() < end:
+                line = mapped.readline()
+                if line.strip():
+                    record = json.loads(line)
+                    rows.append({key: record[key] for key in wanted if key in record})
+                if len(rows) >= chunksize or (rows and mapped.tell() >= end):
+                    yield pd.DataFrame(rows)
+                    rows = []
+    elif path.endswith(".parquet"):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError("pyarrow is required to read Parquet results. Install it or use JSONL/CSV outputs.")
+        available = pq.read_schema(path, memory_map=True).names
+        columns = [c for c in SOURCE_COLUMNS + ["repo"] if c in available]
+        yield pq.read_table(path, columns=columns, memory_map=True).to_pandas()
+    elif path.endswith(".csv"):
+        header = pd.read_csv(path, nrows=0).columns
+        columns = [c for c in SOURCE_COLUMNS + ["repo"] if c in header]
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunksize)
+    else:
+        raise ValueError(f"Unsupported results file format: {path} (expected .jsonl, .parquet or .csv)")
+
+
+def _jsonl_complete_size(path: str, size: Optional[int] = None) -> int:
+    """
+    Byte length of a JSONL file up to and including its last newline.
+
+    Args:
+        path: Path to a .jsonl file
+        size: Only look at the first size bytes (default: the whole file)
+    """
+    if size is None:
+        size = os.path.getsize(path)
+    if not size:
+        return 0
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mapped:
+        return mapped.rfind(b"\n") + 1
+
+
+def _prefix_sha(path: str, length: int) -> str:
+    """Hash the first bytes of a file, used to detect rewrites of appended files."""
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read(min(length, _PREFIX_CHECK_BYTES))).hexdigest()
+
+
+class ResultsStore:
+    """
+    Cached per-run and per-repo RatingStats over many result files.
+
+    refresh() only reads what changed since the previous refresh: unchanged
+    files are skipped, JSONL files that grew are read from where the last
+    refresh stopped, and other changed files are re-read. With a state_path
+    the cached stats persist between processes, so a dashboard refresh over
+    hundreds of runs only stats the files and merges cached summaries.
+    """
+
+    # Bumped when the cached stats format changes; older state is rebuilt
+    STATE_VERSION = 2
+
+    def __init__(self, state_path: Optional[str] = None):
+        self.state_path = state_path
+        self.runs = {}
+        if state_path and os.path.exists(state_path):
+            self._load_state()
+
+    def _load_state(self):
+        """Load cached run state from state_path."""
+        with open(self.state_path) as f:
+            state = json.load(f)
+        if state.get("version") != self.STATE_VERSION:
+            print(f"Ignoring outdated analysis state in {self.state_path}, rebuilding")
+            return
+        for run_id, run in state["runs"].items():
+            self.runs[run_id] = {
+                **run,
+                "stats": RatingStats.from_dict(run["stats"]),
+                "repos": {repo: RatingStats.from_dict(stats) for repo, stats in run["repos"].items()}
+            }
+
+    def save(self):
+        """Persist cached run state to state_path."""
+        if not self.state_path:
+            return
+        state = {"version": self.STATE_VERSION, "runs": {
+            run_id: {
+                **run,
+                "stats": run["stats"].to_dict(),
+                "repos": {repo: stats.to_dict() for repo, stats in run["repos"].items()}
+            }
+            for run_id, run in self.runs.items()
+        }}
+        ensure_directory(os.path.dirname(self.state_path) or ".")
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def _new_run(self, source: Optional[str] = None) -> Dict:
+        """Empty state for a run."""
+        return {"source": source, "mtime": None, "size": None, "offset": 0,
+                "prefix_sha": None, "stats": RatingStats(), "repos": {}}
+
+    def add_rows(self, run_id: str, rows):
+        """
+        Fold new result rows into a run's stats.
+
+        Args:
+            run_id: Run identifier (created if new)
+            rows: DataFrame or list of result dictionaries
+        """
+        df = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(list(rows))
+        if df.empty:
+            return
+        run = self.runs.setdefault(run_id, self._new_run())
+        self._fold(run, df)
+
+    def _fold(self, run: Dict, df: pd.DataFrame):
+        """Update a run's overall and per-repo stats with a chunk of rows."""
+        df = _with_repo(df)
+        run["stats"].update(df)
+        for repo, group in df.groupby("repo", sort=False):
+            run["repos"].setdefault(repo, RatingStats()).update(group)
+
+    def refresh(self, paths: Iterable[str]) -> List[str]:
+        """
+        Bring cached stats up to date with result files.
+
+        Each file is one run, identified by its path. Runs whose file no
+        longer appears in paths are dropped.
+
+        Args:
+            paths: Result file paths (.jsonl, .parquet or .csv)
+
+        Returns:
+            Run ids whose stats changed
+        """
+        paths = list(paths)
+        changed = []
+
+        for path in paths:
+            stat = os.stat(path)
+            run = self.runs.get(path)
+            if run and run["mtime"] == stat.st_mtime and run["size"] == stat.st_size:
+                continue
+
+            appended = (
+                run is not None and path.endswith(".jsonl") and run["offset"]
+                and stat.st_size >= run["offset"]
+                and _prefix_sha(path, run["offset"]) == run["prefix_sha"]
+            )
+            if not appended:
+                run = self._new_run(path)
+                self.runs[path] = run
+
+            # Read JSONL up to the last complete line within the stat'ed size,
+            # so offset, mtime and size describe the same snapshot and rows
+            # appended during the read are picked up by the next refresh
+            end = _jsonl_complete_size(path, stat.st_size) if path.endswith(".jsonl") else None
+            for chunk in read_result_chunks(path, offset=run["offset"], end=end):
+                self._fold(run, chunk)
+
+            if end is not None:
+                run["offset"] = end
+                run["prefix_sha"] = _prefix_sha(path, end)
+            run["mtime"] = stat.st_mtime
+            run["size"] = stat.st_size
+            changed.append(path)
+
+        wanted = set(paths)
+        for run_id in [r for r, run in self.runs.items() if run["source"] and r not in wanted]:
+            del self.runs[run_id]
+            changed.append(run_id)
+
+        if changed:
+            self.save()
+        return changed
+
+    def run_metrics(self) -> pd.DataFrame:
+        """
+        Metrics for each run.
+
+        Returns:
+            DataFrame with one row per run
+        """
+        return pd.DataFrame([{"run_id": run_id, **run["stats"].metrics()} for run_id, run in self.runs.items()])
+
+    def repo_metrics(self) -> pd.DataFrame:
+        """
+        Metrics for each repo, merged across all runs.
+
+        Returns:
+            DataFrame with one row per repo
+        """
+        merged = {}
+        for run in self.runs.values():
+            for repo, stats in run["repos"].items():
+                merged.setdefault(repo, RatingStats()).merge(stats)
+        return pd.DataFrame([{"repo": repo, **stats.metrics()} for repo, stats in sorted(merged.items())])
+
+    def overall_metrics(self) -> Dict:
+        """
+        Metrics across all runs.
+
+        Returns:
+            Metrics dictionary
+        """
+        total = RatingStats()
+        for run in self.runs.values():
+            total.merge(run["stats"])
+        return total.metrics()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Summarize experiment result files incrementally.")
+    parser.add_argument("paths", nargs="+", help="Result files (.jsonl, .parquet or .csv), one per run")
+    parser.add_argument("--state", default="results/analysis_state.json", help="Cache file for aggregate state")
+    args = parser.parse_args()
+
+    store = ResultsStore(args.state)
+    changed = store.refresh(args.paths)
+    print(f"Updated {len(changed)} of {len(args.paths)} runs")
+    print("\n=== PER RUN ===")
+    print(store.run_metrics().to_string(index=False))
+    print("\n=== PER REPO ===")
+    print(store.repo_metrics().to_string(index=False))
+    print("\n=== OVERALL ===")
+    for key, value in store.overall_metrics().items():
+        print(f"{key}: {value:.4f}")
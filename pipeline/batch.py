@@ -0,0 +1,438 @@
+"""
+Offline batch scoring through an OpenAI-compatible batch API.
+
+All judge prompts for a run are written to one JSONL request file, submitted
+as a single batch job, polled until it finishes and reconciled back into the
+experiment results by issue_id and framing. Batch jobs trade hours of latency
+for cheaper, quota-free throughput on large sweeps.
+"""
+
+import hashlib
+import json
+import os
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+import llm_client
+from .records import ResultColumns
+from .scorer import build_score_prompt, parse_score
+from .utils import ensure_directory
+
+
+FRAMINGS = ["self", "other"]
+
+# Batch statuses after which the job will not make further progress
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+# Terminal statuses without usable output; such batches are resubmitted
+FAILED_STATUSES = TERMINAL_STATUSES - {"completed"}
+
+
+def make_custom_id(issue_id: str, framing: str) -> str:
+    """
+    Build the request id used to match batch outputs back to results.
+
+    Args:
+        issue_id: Issue identifier
+        framing: "self" or "other"
+
+    Returns:
+        Custom id string
+    """
+    return f"{issue_id}::{framing}"
+
+
+def parse_custom_id(custom_id: str) -> Tuple[str, str]:
+    """
+    Split a custom id back into issue_id and framing.
+
+    Args:
+        custom_id: Custom id built by make_custom_id()
+
+    Returns:
+        Tuple of (issue_id, framing)
+    """
+    issue_id, framing = custom_id.rsplit("::", 1)
+    return issue_id, framing
+
+
+def build_batch_requests(prs: List[Dict], model: str, temperature: float = 0.7,
+                         max_tokens: int = 500, seeds: Optional[List[Optional[int]]] = None) -> List[Dict]:
+    """
+    Build one chat completion request per PR and framing.
+
+    Both framings of a PR share its seed, so they are paired samples.
+
+    Args:
+        prs: List of PR dictionaries (each with an issue_id)
+        model: Judge model identifier
+        temperature: Sampling temperature
+        max_tokens: Maximum tokens to generate
+        seeds: Sampling seed per PR (None for unseeded sampling)
+
+    Returns:
+        List of batch request dictionaries in OpenAI batch input format
+    """
+    batch_requests = []
+    for pr, seed in zip(prs, seeds or [None] * len(prs)):
+        for framing in FRAMINGS:
+            body = {
+                "model": model,
+                "messages": [{"role": "user", "content": build_score_prompt(pr, framing)}],
+                "max_tokens": max_tokens,
+                "temperature": temperature
+            }
+            if seed is not None:
+                body["seed"] = seed
+            batch_requests.append({
+                "custom_id": make_custom_id(pr["issue_id"], framing),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": body
+            })
+    return batch_requests
+
+
+def write_batch_file(batch_requests: List[Dict], path: str) -> str:
+    """
+    Serialize batch requests to a JSONL file.
+
+    Args:
+        batch_requests: Requests built by build_batch_requests()
+        path: Output file path
+
+    Returns:
+        Path to the written file
+    """
+    ensure_directory(os.path.dirname(path) or ".")
+    with open(path, 'w') as f:
+        for request in batch_requests:
+            f.write(json.dumps(request) + "\n")
+    print(f"Batch request file saved to: {path} ({len(batch_requests)} requests)")
+    return path
+
+
+class OpenAIBatchClient:
+    """
+    Client for an OpenAI-compatible batch API (/files and /batches endpoints).
+    """
+
+    def __init__(self, base_url: str = "https://api.openai.com/v1", api_key_env: str = "OPENAI_API_KEY",
+                 completion_window: str = "24h"):
+        self.base_url = base_url.rstrip("/")
+        self.api_key_env = api_key_env
+        self.completion_window = completion_window
+
+    def _headers(self) -> Dict:
+        """Build authorization headers."""
+        api_key = os.getenv(self.api_key_env)
+        if not api_key:
+            raise ValueError(f"{self.api_key_env} environment variable not set. Please set it in your environment or create a .env file.")
+        return {"Authorization": f"Bearer {api_key}"}
+
+    def submit(self, path: str) -> str:
+        """
+        Upload a request file and create a batch job.
+
+        Args:
+            path: Path to the JSONL request file
+
+        Returns:
+            Batch id
+        """
+        with open(path, 'rb') as f:
+            response = requests.post(
+                f"{self.base_url}/files", headers=self._headers(),
+                files={"file": (os.path.basename(path), f)}, data={"purpose": "batch"}
+            )
+        response.raise_for_status()
+        input_file_id = response.json()["id"]
+
+        response = requests.post(
+            f"{self.base_url}/batches", headers=self._headers(),
+            json={
+                "input_file_id": input_file_id,
+                "endpoint": "/v1/chat/completions",
+                "completion_window": self.completion_window
+            }
+        )
+        response.raise_for_status()
+        return response.json()["id"]
+
+    def status(self, batch_id: str) -> Dict:
+        """
+        Get the current state of a batch job.
+
+        Args:
+            batch_id: Batch id
+
+        Returns:
+            Batch object with at least "status" and, once done, "output_file_id"
+            and/or "error_file_id"
+        """
+        response = requests.get(f"{self.base_url}/batches/{batch_id}", headers=self._headers())
+        response.raise_for_status()
+        return response.json()
+
+    def download(self, file_id: str) -> List[Dict]:
+        """
+        Download a batch output file.
+
+        Args:
+            file_id: Output file id
+
+        Returns:
+            List of output records
+        """
+        response = requests.get(f"{self.base_url}/files/{file_id}/content", headers=self._headers())
+        response.raise_for_status()
+        return [json.loads(line) for line in response.text.splitlines() if line.strip()]
+
+
+class LocalBatchClient:
+    """
+    File-based stand-in for a batch API, for tests and dry runs.
+
+    Submitted request files are copied into a directory and answered on the
+    first status poll using the llm_client backend of each request's model
+    (e.g. the fake backend), producing output in the OpenAI batch format.
+    """
+
+    def __init__(self, directory: str = "results/batches"):
+        self.directory = directory
+        ensure_directory(directory)
+
+    def _batch_path(self, batch_id: str) -> str:
+        return os.path.join(self.directory, f"{batch_id}.json")
+
+    def submit(self, path: str) -> str:
+        """Register a request file as a new batch job."""
+        batch_id = f"batch_{uuid.uuid4().hex[:12]}"
+        with open(path) as f:
+            input_lines = f.read()
+        input_path = os.path.join(self.directory, f"{batch_id}_input.jsonl")
+        with open(input_path, 'w') as f:
+            f.write(input_lines)
+        with open(self._batch_path(batch_id), 'w') as f:
+            json.dump({"id": batch_id, "status": "in_progress", "input_file": input_path}, f)
+        return batch_id
+
+    def status(self, batch_id: str) -> Dict:
+        """Process the batch if it has not run yet and return its state."""
+        with open(self._batch_path(batch_id)) as f:
+            batch = json.load(f)
+        if batch["status"] == "in_progress":
+            batch = self._process(batch)
+        return batch
+
+    def _process(self, batch: Dict) -> Dict:
+        """Answer every request in the batch and write the output file."""
+        with open(batch["input_file"]) as f:
+            batch_requests = [json.loads(line) for line in f if line.strip()]
+
+        outputs = []
+        for request in batch_requests:
+            body = request["body"]
+            try:
+                content = llm_client.call_model(
+                    body["messages"][0]["content"], model=body["model"],
+                    temperature=body.get("temperature", 0.7), max_tokens=body.get("max_tokens", 500),
+                    seed=body.get("seed")
+                )
+                outputs.append({
+                    "custom_id": request["custom_id"],
+                    "response": {"status_code": 200, "body": {"choices": [{"message": {"content": content}}]}},
+                    "error": None
+                })
+            except Exception as e:
+                outputs.append({"custom_id": request["custom_id"], "response": None, "error": {"message": str(e)}})
+
+        output_path = os.path.join(self.directory, f"{batch['id']}_output.jsonl")
+        with open(output_path, 'w') as f:
+            for output in outputs:
+                f.write(json.dumps(output) + "\n")
+
+        batch.update({"status": "completed", "output_file_id": output_path})
+        with open(self._batch_path(batch["id"]), 'w') as f:
+            json.dump(batch, f)
+        return batch
+
+    def download(self, file_id: str) -> List[Dict]:
+        """Read a batch output file."""
+        with open(file_id) as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+
+def create_batch_client(spec: Dict, batch_dir: str):
+    """
+    Create a batch client from the "batch_api" config entry.
+
+    Args:
+        spec: Dictionary with "type" ("openai" or "local") plus client settings
+        batch_dir: Default directory for the local stand-in
+
+    Returns:
+        OpenAIBatchClient or LocalBatchClient
+
+    Raises:
+        ValueError: If the client type is unknown
+    """
+    if spec["type"] == "openai":
+        return OpenAIBatchClient(spec["base_url"], spec["api_key_env"], spec["completion_window"])
+    if spec["type"] == "local":
+        return LocalBatchClient(spec.get("directory") or batch_dir)
+    raise ValueError(f"Unknown batch API type: {spec['type']} (choose from openai, local)")
+
+
+def _file_sha256(path: str) -> str:
+    """Hash a file's contents."""
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def submit_and_wait(client, path: str, state_path: str, poll_interval: float = 60,
+                    timeout: Optional[float] = None) -> List[Dict]:
+    """
+    Submit a request file and poll until the batch finishes.
+
+    The batch id is saved to state_path, so re-running with an identical
+    request file resumes the existing job (still running or completed)
+    instead of resubmitting. A saved batch that failed, expired or was
+    cancelled is resubmitted.
+
+    Requests that failed inside a completed batch are listed in its error
+    file; those records are returned along with the outputs, so they get
+    the neutral fallback rating.
+
+    Args:
+        client: Batch client
+        path: Path to the JSONL request file
+        state_path: Path of the JSON file tracking the submitted batch
+        poll_interval: Seconds between status polls
+        timeout: Maximum seconds to wait (None waits indefinitely)
+
+    Returns:
+        List of batch output and error records
+
+    Raises:
+        RuntimeError: If the batch does not complete successfully
+        TimeoutError: If the batch is still running after timeout seconds
+    """
+    input_hash = _file_sha256(path)
+    batch_id = None
+    if os.path.exists(state_path):
+        with open(state_path) as f:
+            state = json.load(f)
+        if state.get("input_sha256") == input_hash:
+            batch_id = state["batch_id"]
+            status = client.status(batch_id)["status"]
+            if status in FAILED_STATUSES:
+                print(f"Batch {batch_id} {status}, resubmitting")
+                batch_id = None
+            else:
+                print(f"Resuming batch {batch_id}")
+
+    if batch_id is None:
+        batch_id = client.submit(path)
+        with open(state_path, 'w') as f:
+            json.dump({"batch_id": batch_id, "input_sha256": input_hash, "input_file": path}, f, indent=2)
+        print(f"Submitted batch {batch_id}")
+
+    start = time.monotonic()
+    while True:
+        batch = client.status(batch_id)
+        if batch["status"] in TERMINAL_STATUSES:
+            break
+        if timeout is not None and time.monotonic() - start > timeout:
+            raise TimeoutError(f"Batch {batch_id} still {batch['status']} after {timeout} seconds")
+        print(f"Batch {batch_id} {batch['status']}, checking again in {poll_interval}s")
+        time.sleep(poll_interval)
+
+    file_ids = [batch.get(key) for key in ("output_file_id", "error_file_id") if batch.get(key)]
+    if batch["status"] != "completed" or not file_ids:
+        raise RuntimeError(f"Batch {batch_id} ended with status {batch['status']}")
+
+    print(f"Batch {batch_id} completed")
+    return [record for file_id in file_ids for record in client.download(file_id)]
+
+
+def parse_batch_outputs(outputs: List[Dict]) -> Dict[Tuple[str, str], float]:
+    """
+    Parse batch output records into ratings.
+
+    Failed requests get the same neutral 5.0 fallback as score_pr().
+
+    Args:
+        outputs: Batch output records
+
+    Returns:
+        Dictionary mapping (issue_id, framing) to rating
+    """
+    ratings = {}
+    for output in outputs:
+        key = parse_custom_id(output["custom_id"])
+        response = output.get("response") or {}
+        if output.get("error") or response.get("status_code") != 200:
+            print(f"Batch request {output['custom_id']} failed: {output.get('error') or response}")
+            ratings[key] = 5.0
+            continue
+        choices = response["body"].get("choices") or []
+        ratings[key] = parse_score(choices[0]["message"]["content"]) if choices else 5.0
+    return ratings
+
+
+def reconcile_batch_results(results: ResultColumns, ratings: Dict[Tuple[str, str], float]) -> ResultColumns:
+    """
+    Fill batch ratings into experiment results by issue_id and framing.
+
+    Rows without a batch rating get the neutral 5.0 fallback.
+
+    Args:
+        results: Experiment results (updated in place)
+        ratings: Ratings from parse_batch_outputs()
+
+    Returns:
+        The updated results
+    """
+    missing = 0
+    for index, issue_id in enumerate(results.issue_ids()):
+        row_ratings = []
+        for framing in FRAMINGS:
+            key = (issue_id, framing)
+            if key not in ratings:
+                missing += 1
+            row_ratings.append(ratings.get(key, 5.0))
+        results.set_ratings(index, *row_ratings)
+    if missing:
+        print(f"Warning: {missing} ratings missing from batch output, using neutral fallback")
+    return results
+
+
+def score_results_offline(results: ResultColumns, prs: List[Dict], config: Dict,
+                          seeds: Optional[List[Optional[int]]] = None) -> ResultColumns:
+    """
+    Score all PRs of a run through the batch API and reconcile the ratings.
+
+    Args:
+        results: Experiment results, one row per PR (updated in place)
+        prs: PR dictionaries, each with an issue_id
+        config: Resolved run config (judge model, sampling, batch_api settings)
+        seeds: Sampling seed per PR, shared by both framings
+
+    Returns:
+        The updated results
+    """
+    spec = config["batch_api"]
+    batch_dir = os.path.join(config["results_dir"], "batches")
+    request_path = write_batch_file(
+        build_batch_requests(prs, config["judge_model"], config["temperature"], config["max_tokens"], seeds),
+        os.path.join(batch_dir, "judge_requests.jsonl")
+    )
+    outputs = submit_and_wait(
+        create_batch_client(spec, batch_dir), request_path,
+        os.path.join(batch_dir, "batch_state.json"),
+        poll_interval=spec["poll_interval"], timeout=spec["timeout"]
+    )
+    return reconcile_batch_results(results, parse_batch_outputs(outputs))
@@ -0,0 +1,294 @@
+"""
+Experiment configuration and run manifests.
+"""
+
+import copy
+import importlib.util
+import json
+import os
+import platform
+import subprocess
+import sys
+import uuid
+from typing import Dict, List, Optional
+
+from .utils import ensure_directory, get_timestamp
+
+
+DEFAULT_MODEL = "google/gemma-2-9b-it:free"
+
+# Every tunable knob of a run. Config files and CLI flags override these keys.
+DEFAULT_CONFIG = {
+    # Concurrency
+    "parallel": True,
+    "max_workers": 1,
+    # Rate limits (None = unlimited)
+    "requests_per_minute": None,
+    # Models
+    "generator_model": DEFAULT_MODEL,
+    "judge_model": DEFAULT_MODEL,
+    # Backends: built-in "openrouter" and "fake", plus any named specs in
+    # "backends", e.g. {"local": {"type": "openai_compatible",
+    # "base_url": "http://localhost:8000/v1"}}. "model_backends" maps a
+    # model identifier to a backend name; other models use "default_backend".
+    "default_backend": "openrouter",
+    "backends": {},
+    "model_backends": {},
+    # Scoring: "sync" calls the judge per request, "batch" submits all judge
+    # prompts as one offline job to an OpenAI-compatible batch API ("openai")
+    # or the file-based stand-in ("local", for tests and dry runs)
+    "scoring_mode": "sync",
+    "batch_api": {
+        "type": "openai",
+        "base_url": "https://api.openai.com/v1",
+        "api_key_env": "OPENAI_API_KEY",
+        "completion_window": "24h",
+        "directory": None,
+        "poll_interval": 60,
+        "timeout": None
+    },
+    # Ground truth: "random" draws a seeded coin flip per issue, "swebench"
+    # applies each generated diff at base_commit and runs the instance's
+    # FAIL_TO_PASS/PASS_TO_PASS tests locally, using pre-fetched repo mirrors
+    # in repos_dir (owner__name) and wheels in wheelhouse, with no network.
+    # "specs" overrides install/test settings per "repo" or "repo@version".
+    "ground_truth": "random",
+    "swebench": {
+        "repos_dir": "repos",
+        "work_dir": "eval_work",
+        "envs_dir": "eval_envs",
+        "wheelhouse": None,
+        "workers": 4,
+        "timeout": 1800,
+        "cache_path": None,
+        "specs": {}
+    },
+    # Sampling
+    "temperature": 0.7,
+    "max_tokens": 500,
+    # Generated PRs carry a full diff, which needs far more room than a
+    # judge rating; max_tokens applies to judge calls
+    "generator_max_tokens": 4096,
+    "seed": None,
+    # Variance reduction: each sample rates both framings under one seed.
+    # Sampling stops for an issue once the confidence interval half-width on
+    # its self_other_diff is at most issue_ci_half_width (or after
+    # max_samples_per_issue), and for the run once the half-width on mean
+    # self_other_diff is at most run_ci_half_width (after min_issues).
+    "min_samples_per_issue": 1,
+    "max_samples_per_issue": 1,
+    "issue_ci_half_width": None,
+    "run_ci_half_width": None,
+    "min_issues": 10,
+    "confidence": 0.95,
+    # Dataset
+    "n_issues": 20,
+    "dataset_name": "princeton-nlp/SWE-bench",
+    "dataset_split": "test",
+    "dataset_revision": None,
+    # Outputs
+    "results_dir": "results",
+    "output_formats": ["csv", "plot", "inspect_ai"],
+}
+
+OUTPUT_FORMATS = ["csv", "jsonl", "parquet", "plot", "inspect_ai"]
+SCORING_MODES = ["sync", "batch"]
+GROUND_TRUTH_MODES = ["random", "swebench"]
+# Engines pandas can write Parquet with
+PARQUET_ENGINES = ["pyarrow", "fastparquet"]
+
+
+def load_config_file(path: str) -> Dict:
+    """
+    Load configuration overrides from a JSON or YAML file.
+
+    Args:
+        path: Path to a .json, .yaml or .yml file
+
+    Returns:
+        Dictionary of configuration overrides
+
+    Raises:
+        ValueError: If the file format is unsupported or contains unknown keys
+    """
+    with open(path) as f:
+        if path.endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError("PyYAML is required to read YAML config files. Use a .json config instead.")
+            overrides = yaml.safe_load(f) or {}
+        elif path.endswith(".json"):
+            overrides = json.load(f)
+        else:
+            raise ValueError(f"Unsupported config file format: {path} (expected .json, .yaml or .yml)")
+
+    if not isinstance(overrides, dict):
+        raise ValueError(f"Config file {path} must contain a mapping of settings")
+    return overrides
+
+
+def resolve_config(config_path: Optional[str] = None, overrides: Optional[Dict] = None) -> Dict:
+    """
+    Resolve the effective configuration for a run.
+
+    Precedence (lowest to highest): DEFAULT_CONFIG, config file, overrides.
+    Overrides with a value of None are ignored so unset CLI flags do not
+    clobber config file settings. Mapping settings (e.g. batch_api) are
+    merged key by key.
+
+    Args:
+        config_path: Optional path to a JSON/YAML config file
+        overrides: Optional dictionary of explicit overrides (e.g. CLI flags)
+
+    Returns:
+        Fully resolved configuration dictionary
+
+    Raises:
+        ValueError: If any setting is unknown or invalid
+    """
+    config = copy.deepcopy(DEFAULT_CONFIG)
+
+    layers = []
+    if config_path:
+        layers.append(load_config_file(config_path))
+    if overrides:
+        layers.append({key: value for key, value in overrides.items() if value is not None})
+
+    for layer in layers:
+        unknown = sorted(set(layer) - set(DEFAULT_CONFIG))
+        if unknown:
+            raise ValueError(f"Unknown config keys: {', '.join(unknown)}")
+        for key, value in layer.items():
+            if isinstance(config[key], dict) and isinstance(value, dict):
+                config[key] = {**config[key], **value}
+            else:
+                config[key] = value
+
+    validate_config(config)
+    return config
+
+
+def validate_config(config: Dict):
+    """
+    Validate a resolved configuration.
+
+    Args:
+        config: Configuration dictionary
+
+    Raises:
+        ValueError: If any setting is out of range
+    """
+    if config["n_issues"] < 1:
+        raise ValueError("n_issues must be at least 1")
+    if config["max_workers"] < 1:
+        raise ValueError("max_workers must be at least 1")
+    if config["requests_per_minute"] is not None and config["requests_per_minute"] <= 0:
+        raise ValueError("requests_per_minute must be positive")
+    if not 0 <= config["temperature"] <= 2:
+        raise ValueError("temperature must be between 0 and 2")
+    if config["max_tokens"] < 1:
+        raise ValueError("max_tokens must be at least 1")
+    if config["generator_max_tokens"] < 1:
+        raise ValueError("generator_max_tokens must be at least 1")
+
+    if not 1 <= config["min_samples_per_issue"] <= config["max_samples_per_issue"]:
+        raise ValueError("Need 1 <= min_samples_per_issue <= max_samples_per_issue")
+    if not 0 < config["confidence"] < 1:
+        raise ValueError("confidence must be between 0 and 1")
+    if config["scoring_mode"] == "batch" and config["max_samples_per_issue"] > 1:
+        raise ValueError("Batch scoring takes one paired sample per issue; set max_samples_per_issue to 1")
+
+    if config["scoring_mode"] not in SCORING_MODES:
+        raise ValueError(f"Unknown scoring mode: {config['scoring_mode']} (choose from {', '.join(SCORING_MODES)})")
+
+    if config["ground_truth"] not in GROUND_TRUTH_MODES:
+        raise ValueError(f"Unknown ground truth mode: {config['ground_truth']} (choose from {', '.join(GROUND_TRUTH_MODES)})")
+    if config["swebench"]["workers"] < 1:
+        raise ValueError("swebench workers must be at least 1")
+
+    unknown_formats = sorted(set(config["output_formats"]) - set(OUTPUT_FORMATS))
+    if unknown_formats:
+        raise ValueError(f"Unknown output formats: {', '.join(unknown_formats)} (choose from {', '.join(OUTPUT_FORMATS)})")
+    if "parquet" in config["output_formats"] and not any(importlib.util.find_spec(engine) for engine in PARQUET_ENGINES):
+        raise ValueError("The parquet output format needs pyarrow (pip install pyarrow); use jsonl instead")
+
+
+def _get_code_revision() -> Optional[str]:
+    """
+    Get the git commit of the experiment code, if available.
+
+    Returns:
+        Commit hash (with "-dirty" suffix for uncommitted changes) or None
+    """
+    repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=repo_dir,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], cwd=repo_dir,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+        return f"{commit}-dirty" if dirty else commit
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_run_manifest(config: Dict, dataset_info: Dict, timings: Dict,
+                       call_stats: Dict, metrics: Dict, outputs: List[str],
+                       backends: Optional[Dict] = None, sampling: Optional[Dict] = None,
+                       evaluation: Optional[Dict] = None) -> str:
+    """
+    Write a manifest describing a single run so runs can be compared side by side.
+
+    Args:
+        config: Resolved configuration used for the run
+        dataset_info: Dataset name, split and resolved revision
+        timings: Wall-clock seconds per phase
+        call_stats: Model call latency statistics
+        metrics: Experiment metrics
+        outputs: Paths of files written by the run
+        backends: Backend capabilities per role (generator, judge)
+        sampling: Issues rated, rating samples taken and whether the run stopped early
+        evaluation: Ground-truth evaluation outcomes by status
+
+    Returns:
+        Path to the saved manifest
+    """
+    # The suffix keeps runs started in the same second apart
+    run_id = f"{get_timestamp()}_{uuid.uuid4().hex[:8]}"
+    manifest_dir = os.path.join(config["results_dir"], "manifests")
+    ensure_directory(manifest_dir)
+
+    n_rows = metrics.get("total_issues", 0)
+    run_seconds = timings.get("run", 0.0)
+
+    manifest = {
+        "run_id": run_id,
+        "config": config,
+        "dataset": dataset_info,
+        "code_revision": _get_code_revision(),
+        "environment": {
+            "python": sys.version.split()[0],
+            "platform": platform.platform()
+        },
+        "timings": {
+            **timings,
+            "issues_per_second": n_rows / run_seconds if run_seconds > 0 else None
+        },
+        "backends": backends or {},
+        "sampling": sampling or {},
+        "evaluation": evaluation or {},
+        "model_calls": call_stats,
+        "metrics": metrics,
+        "outputs": outputs
+    }
+
+    manifest_path = os.path.join(manifest_dir, f"run_{run_id}.json")
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2, default=str)
+
+    print(f"Run manifest saved to: {manifest_path}")
+    return manifest_path
@@ -4,23 +4,27 @@ Simple dataset creation using inspect_ai framework.
 
 import pandas as pd
 import json
-from typing import Dict, List
+from typing import Dict, List, Union
 from inspect_ai import Task, TaskInfo
+from .analysis import RatingStats
 
 
-def create_experiment_dataset(results: List[Dict], output_dir: str = ".") -> Dict:
+def create_experiment_dataset(results: Union[pd.DataFrame, List[Dict]], output_dir: str = ".") -> Dict:
     """
     Create comprehensive dataset using inspect_ai framework.
     
     Args:
-        results: List of experiment results
+        results: Experiment results DataFrame (or list of result dictionaries)
         output_dir: Directory to save outputs
         
     Returns:
         Dictionary with dataset information
     """
-    # Create detailed CSV dataset
-    detailed_df = pd.DataFrame(results)
+    frame = results if isinstance(results, pd.DataFrame) else pd.DataFrame(results)
+    metrics = RatingStats.from_frame(frame).metrics()
+    
+    # Create detailed CSV dataset (shallow copy: the metadata columns must not leak into the caller's frame)
+    detailed_df = frame.copy(deep=False)
     
     # Add inspect_ai metadata
     detailed_df['evaluation_framework'] = 'inspect_ai'
@@ -31,35 +35,40 @@ def create_experiment_dataset(results: List[Dict], output_dir: str = ".") -> Dic
     detailed_csv_path = f"{output_dir}/inspect_ai_results.csv"
     detailed_df.to_csv(detailed_csv_path, index=False)
     
-    # Create JSON dataset
-    json_dataset = {
-        "inspect_ai_metadata": {
-            "framework": "inspect_ai",
-            "version": "0.3.125",
-            "experiment": "self-sycophancy-swebench",
-            "total_issues": len(results),
-            "evaluation_method": "choice-based rating (0-10)"
-        },
-        "results": results,
-        "summary": {
-            "mean_self_rating": detailed_df["rating_self"].mean(),
-            "mean_other_rating": detailed_df["rating_other"].mean(),
-            "self_sycophancy_score": detailed_df["self_other_diff"].mean()
-        }
+    # Create JSON dataset. The results are written by the frame's own JSON
+    # writer, column by column, without building a dict per row (missing
+    # ratings and labels become null).
+    metadata = {
+        "framework": "inspect_ai",
+        "version": "0.3.125",
+        "experiment": "self-sycophancy-swebench",
+        "total_issues": len(frame),
+        "evaluation_method": "choice-based rating (0-10)"
+    }
+    summary = {
+        "mean_self_rating": metrics["mean_self"],
+        "mean_other_rating": metrics["mean_other"],
+        "self_sycophancy_score": metrics["mean_self_other_diff"]
     }
     
     json_path = f"{output_dir}/inspect_ai_dataset.json"
     with open(json_path, 'w') as f:
-        json.dump(json_dataset, f, indent=2, default=str)
+        f.write('{\n"inspect_ai_metadata": ')
+        json.dump(metadata, f, indent=2, default=str)
+        f.write(',\n"results": ')
+        frame.to_json(f, orient="records", date_format="iso")
+        f.write(',\n"summary": ')
+        json.dump(summary, f, indent=2, default=str)
+        f.write('\n}\n')
     
     # Create summary
     summary_df = pd.DataFrame([{
         "metric": "Self-Sycophancy Score",
-        "value": detailed_df["self_other_diff"].mean(),
+        "value": metrics["mean_self_other_diff"],
         "description": "Positive = self-sycophancy, Negative = self-criticism"
     }, {
         "metric": "Total Issues",
-        "value": len(results),
+        "value": len(frame),
         "description": "Number of issues evaluated"
     }, {
         "metric": "Framework",
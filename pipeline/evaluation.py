@@ -0,0 +1,729 @@
+"""
+Ground-truth evaluation of generated PRs with the SWE-bench test harness.
+
+Each generated diff is applied to a checkout of the instance's repo at
+base_commit together with the instance's test_patch, and the FAIL_TO_PASS
+and PASS_TO_PASS tests are run locally. A PR is resolved (ground truth 1)
+when every one of those tests passes.
+
+Evaluations run in a process pool next to LLM scoring. Each worker owns a
+slot directory holding one checkout per repo, shared from the pre-fetched
+mirror in repos_dir and reset to base_commit per instance, so no clone or
+network access happens per evaluation. Dependency environments are built
+once per (repo, version) from a local wheelhouse and shared by all workers.
+Results are cached by (instance_id, diff hash), so re-runs only evaluate new
+diffs.
+
+Generated code runs on the host, not in a container. Commands get a minimal
+environment (no API keys), and test runs are cut off from the network with
+bwrap or unshare where one of them works; otherwise they have the same
+network access as the run.
+"""
+
+import fcntl
+import hashlib
+import inspect
+import json
+import multiprocessing
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import time
+from collections import Counter
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from .utils import ensure_directory
+
+try:
+    from swebench.harness.constants import MAP_REPO_VERSION_TO_SPECS
+except ImportError:
+    MAP_REPO_VERSION_TO_SPECS = {}
+
+try:
+    from swebench.harness.log_parsers import MAP_REPO_TO_PARSER
+except ImportError:
+    try:
+        from swebench.harness.log_parsers.python import MAP_REPO_TO_PARSER_PY as MAP_REPO_TO_PARSER
+    except ImportError:
+        MAP_REPO_TO_PARSER = {}
+
+
+# Evaluation outcomes. Only the first three depend on the diff alone: they
+# give a ground-truth label and are cached. The others are infrastructure
+# failures (or a PR that was never generated); those PRs stay unlabeled and
+# are retried on the next run.
+LABELED_STATUSES = {"resolved", "unresolved", "patch_failed"}
+STATUSES = ["resolved", "unresolved", "patch_failed", "test_patch_failed", "install_failed",
+            "timeout", "repo_missing", "missing_instance", "generation_failed", "error"]
+
+# Test statuses that count as passing
+PASSING_TEST_STATUSES = {"PASSED", "XFAIL"}
+
+DEFAULT_TEST_CMD = "python -m pytest --no-header -rA --tb=no -p no:cacheprovider"
+DEFAULT_INSTALL_CMD = "python -m pip install --no-deps -e ."
+REQUIREMENTS_PATHS = ["requirements.txt", "requirements-dev.txt", "requirements/test.txt"]
+# Seconds a worker waits for a free slot before giving up
+SLOT_WAIT_SECONDS = 60
+# Host environment variables passed to install and test commands. Everything
+# else, including the API keys load_dotenv puts in os.environ, is withheld.
+PASSTHROUGH_ENV_VARS = ("PATH", "HOME", "LANG", "LC_ALL", "TMPDIR")
+# Command prefixes tried, in order, to run tests without network access
+NETWORK_ISOLATION_PREFIXES = [
+    ["bwrap", "--dev-bind", "/", "/", "--unshare-net", "--die-with-parent"],
+    ["unshare", "--net", "--map-root-user"]
+]
+NON_TEST_EXTENSIONS = (".json", ".png", ".csv", ".txt", ".md", ".jpg", ".jpeg", ".pkl", ".yml", ".yaml", ".toml", ".rst")
+
+
+def diff_hash(diff: str) -> str:
+    """
+    Hash a diff for the evaluation cache key.
+
+    Args:
+        diff: Unified diff text
+
+    Returns:
+        Hex sha256 of the diff
+    """
+    return hashlib.sha256(diff.encode("utf-8")).hexdigest()
+
+
+def _as_list(value) -> List[str]:
+    """Read a test list stored either as a list or as a JSON string (as on Hugging Face)."""
+    if not value:
+        return []
+    if isinstance(value, str):
+        return json.loads(value)
+    return list(value)
+
+
+def _repo_dirname(repo: str) -> str:
+    """Directory name for a repo, in the SWE-bench owner__name convention."""
+    return repo.replace("/", "__")
+
+
+def get_test_directives(issue: Dict) -> List[str]:
+    """
+    Test files (or modules, for Django) touched by an instance's test_patch.
+
+    Args:
+        issue: Issue dictionary with repo and test_patch
+
+    Returns:
+        Test selectors to pass to the test command
+    """
+    paths = []
+    for line in issue.get("test_patch", "").splitlines():
+        if line.startswith("diff --git a/"):
+            path = line.split(" b/", 1)[-1]
+            if not path.endswith(NON_TEST_EXTENSIONS):
+                paths.append(path)
+
+    if issue.get("repo") == "django/django":
+        paths = [
+            (path[len("tests/"):] if path.startswith("tests/") else path)[:-len(".py")].replace("/", ".")
+            for path in paths if path.endswith(".py")
+        ]
+    return paths
+
+
+def get_spec(issue: Dict, overrides: Dict) -> Dict:
+    """
+    Install and test settings for an instance.
+
+    Settings from swebench's MAP_REPO_VERSION_TO_SPECS (when that version of
+    swebench provides it) are overridden by the config's "specs", keyed by
+    "repo@version" or "repo". swebench's pre_install commands are written
+    for its Docker images (apt-get, /etc edits) and are dropped; pre_install
+    only runs when the config's specs set it.
+
+    Args:
+        issue: Issue dictionary with repo and version
+        overrides: The swebench "specs" config mapping
+
+    Returns:
+        Spec dictionary (python, packages, pip_packages, pre_install, install, test_cmd)
+    """
+    repo, version = issue.get("repo"), str(issue.get("version", ""))
+    spec = {key: value for key, value in MAP_REPO_VERSION_TO_SPECS.get(repo, {}).get(version, {}).items()
+            if key != "pre_install"}
+    spec.update(overrides.get(repo, {}))
+    spec.update(overrides.get(f"{repo}@{version}", {}))
+    return spec
+
+
+def grade_log(issue: Dict, log: str, exit_code: int) -> Tuple[bool, Dict]:
+    """
+    Decide whether an instance is resolved from its test log.
+
+    With a swebench log parser for the repo, every FAIL_TO_PASS and
+    PASS_TO_PASS test must pass. Without one, the test command's exit code
+    decides.
+
+    Args:
+        issue: Issue dictionary with repo, FAIL_TO_PASS and PASS_TO_PASS
+        log: Test command output
+        exit_code: Test command exit code
+
+    Returns:
+        Tuple of (resolved, passed/total counts per test list)
+
+    Raises:
+        EvaluationError: With status "error" if none of the listed tests
+            appear in the log (the tests did not run, e.g. a broken
+            environment failed collection)
+    """
+    parser = MAP_REPO_TO_PARSER.get(issue.get("repo"))
+    if parser is None:
+        return exit_code == 0, {}
+
+    # swebench >= 4 parsers take (log, test_spec); earlier ones take (log)
+    if len(inspect.signature(parser).parameters) > 1:
+        status_map = parser(log, None)
+    else:
+        status_map = parser(log)
+
+    tests = {}
+    reported = 0
+    for key in ("FAIL_TO_PASS", "PASS_TO_PASS"):
+        names = _as_list(issue.get(key))
+        passed = sum(status_map.get(name) in PASSING_TEST_STATUSES for name in names)
+        reported += sum(name in status_map for name in names)
+        tests[key] = {"passed": passed, "total": len(names)}
+    if not reported and any(counts["total"] for counts in tests.values()):
+        raise EvaluationError("error", "None of the FAIL_TO_PASS or PASS_TO_PASS tests appear in the test log")
+    resolved = all(counts["passed"] == counts["total"] for counts in tests.values())
+    if not any(counts["total"] for counts in tests.values()):
+        resolved = exit_code == 0
+    return resolved, tests
+
+
+class EvaluationError(Exception):
+    """An evaluation step failed with the given status."""
+
+    def __init__(self, status: str, message: str = ""):
+        super().__init__(message or status)
+        self.status = status
+
+
+# Per-worker state, set up by _init_worker in each pool process
+_worker = {}
+
+
+def _try_lock_slot(work_dir: str, slot: int):
+    """Lock a slot without blocking; returns the open lock file, or None if the slot is taken."""
+    lock = open(os.path.join(work_dir, f"slot_{slot}.lock"), "w")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock.close()
+        return None
+    return lock
+
+
+def count_free_slots(settings: Dict) -> int:
+    """
+    Count the slots in work_dir not held by a running worker.
+
+    Args:
+        settings: Resolved swebench config
+
+    Returns:
+        Number of free slots (at most settings["workers"])
+    """
+    work_dir = os.path.abspath(settings["work_dir"])
+    ensure_directory(work_dir)
+    free = 0
+    for slot in range(settings["workers"]):
+        lock = _try_lock_slot(work_dir, slot)
+        if lock is not None:
+            free += 1
+            lock.close()
+    return free
+
+
+def _terminate_worker(signum, frame):
+    """Stop the running test command along with the worker when the pool is torn down."""
+    process = _worker.get("process")
+    if process is not None and process.poll() is None:
+        os.killpg(process.pid, signal.SIGKILL)
+    sys.exit(1)
+
+
+def _init_worker(settings: Dict):
+    """
+    Claim a free slot directory for this worker process.
+
+    Slots are held with an exclusive lock for the life of the process, so
+    each checkout is used by one worker at a time even across runs sharing
+    work_dir.
+
+    Args:
+        settings: Resolved swebench config
+
+    Raises:
+        RuntimeError: If no slot frees up within SLOT_WAIT_SECONDS
+    """
+    work_dir = os.path.abspath(settings["work_dir"])
+    ensure_directory(work_dir)
+    signal.signal(signal.SIGTERM, _terminate_worker)
+    deadline = time.monotonic() + SLOT_WAIT_SECONDS
+    while True:
+        for slot in range(settings["workers"]):
+            lock = _try_lock_slot(work_dir, slot)
+            if lock is None:
+                continue
+            slot_dir = os.path.join(work_dir, f"slot_{slot}")
+            ensure_directory(slot_dir)
+            _worker.update(settings=settings, lock=lock, slot_dir=slot_dir, checkouts={}, venvs={})
+            return
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"No free evaluation slot in {work_dir} after {SLOT_WAIT_SECONDS}s; "
+                               f"another run is using it. Wait for it or set a different swebench work_dir.")
+        time.sleep(1)
+
+
+def _run(cmd, cwd: str, env: Optional[Dict] = None, timeout: Optional[float] = None) -> Tuple[int, str]:
+    """
+    Run a command, killing its whole process group on timeout.
+
+    Args:
+        cmd: Argument list, or a string run through bash
+        cwd: Working directory
+        env: Environment (default: inherited)
+        timeout: Seconds before the command is killed
+
+    Returns:
+        Tuple of (exit code, combined stdout/stderr)
+
+    Raises:
+        EvaluationError: With status "timeout" if the command timed out
+    """
+    if isinstance(cmd, str):
+        cmd = ["bash", "-c", cmd]
+    process = subprocess.Popen(cmd, cwd=cwd, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                               text=True, errors="replace", start_new_session=True)
+    _worker["process"] = process
+    try:
+        output, _ = process.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+        process.communicate()
+        raise EvaluationError("timeout", f"Timed out after {timeout}s: {' '.join(cmd)}")
+    finally:
+        _worker.pop("process", None)
+    return process.returncode, output
+
+
+def _pip_env(settings: Dict, venv: Optional[str] = None) -> Dict:
+    """Minimal environment for offline pip installs and test runs, optionally inside a venv."""
+    env = {name: os.environ[name] for name in PASSTHROUGH_ENV_VARS if name in os.environ}
+    env.update(PIP_NO_INDEX="1", PIP_DISABLE_PIP_VERSION_CHECK="1")
+    if settings.get("wheelhouse"):
+        env["PIP_FIND_LINKS"] = os.path.abspath(settings["wheelhouse"])
+    if venv:
+        env["VIRTUAL_ENV"] = venv
+        env["PATH"] = os.path.join(venv, "bin") + os.pathsep + env.get("PATH", "")
+    return env
+
+
+def _python_for(spec: Dict) -> str:
+    """
+    Interpreter for an environment: python<version> when the spec names a
+    version, otherwise the running interpreter.
+
+    Raises:
+        EvaluationError: With status "install_failed" if the named version
+            is not on PATH
+    """
+    if not spec.get("python"):
+        return sys.executable
+    python = shutil.which(f"python{spec['python']}")
+    if python is None:
+        raise EvaluationError("install_failed", f"python{spec['python']} is not on PATH")
+    return python
+
+
+def _network_isolation() -> List[str]:
+    """
+    Command prefix that runs a command without network access.
+
+    The first of NETWORK_ISOLATION_PREFIXES that works here is used, probed
+    once per worker. Returns [] (with a warning) when none works.
+    """
+    if "isolation" not in _worker:
+        _worker["isolation"] = []
+        for prefix in NETWORK_ISOLATION_PREFIXES:
+            if shutil.which(prefix[0]) and _run(prefix + ["true"], cwd=_worker["slot_dir"])[0] == 0:
+                _worker["isolation"] = prefix
+                break
+        else:
+            print("Warning: neither bwrap nor unshare can disable networking here; "
+                  "generated code is tested with network access")
+    return _worker["isolation"]
+
+
+def _site_packages(venv: str) -> str:
+    """Path of a venv's site-packages directory."""
+    code, output = _run([os.path.join(venv, "bin", "python"), "-c",
+                         "import sysconfig; print(sysconfig.get_paths()['purelib'])"], cwd=venv)
+    if code != 0:
+        raise EvaluationError("install_failed", output)
+    return output.strip()
+
+
+def _mirror_path(settings: Dict, repo: str) -> Optional[str]:
+    """Pre-fetched mirror of a repo in repos_dir, as a working clone or a bare .git mirror."""
+    base = os.path.join(settings["repos_dir"], _repo_dirname(repo))
+    for path in (base, base + ".git"):
+        if os.path.isdir(path):
+            return os.path.abspath(path)
+    return None
+
+
+def _requirements(mirror: str, commit: str) -> List[str]:
+    """Read the first requirements file found at a commit of the mirror."""
+    for path in REQUIREMENTS_PATHS:
+        code, output = _run(["git", "show", f"{commit}:{path}"], cwd=mirror)
+        if code == 0:
+            return [line.strip() for line in output.splitlines()
+                    if line.strip() and not line.strip().startswith(("#", "-e", "-r"))]
+    return []
+
+
+def _shared_env(issue: Dict, spec: Dict, mirror: str) -> str:
+    """
+    Get the dependency environment for an instance's (repo, version).
+
+    The environment is built once, under a file lock so concurrent workers
+    wait for the first builder, and marked with a .ready stamp. A failed
+    build leaves a .failed stamp (with the pip log) that is not retried;
+    delete it to rebuild.
+
+    Args:
+        issue: Issue dictionary
+        spec: Install and test settings
+        mirror: Path to the repo mirror
+
+    Returns:
+        Path to the environment
+
+    Raises:
+        EvaluationError: With status "install_failed" if the build failed
+    """
+    settings = _worker["settings"]
+    envs_dir = os.path.abspath(settings["envs_dir"])
+    ensure_directory(envs_dir)
+    env_dir = os.path.join(envs_dir, f"{_repo_dirname(issue['repo'])}__{issue.get('version', 'default')}")
+
+    with open(env_dir + ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if os.path.exists(env_dir + ".ready"):
+            return env_dir
+        if os.path.exists(env_dir + ".failed"):
+            raise EvaluationError("install_failed", f"Environment build failed earlier, see {env_dir}.failed")
+
+        packages = list(spec.get("pip_packages", []))
+        if spec.get("packages") == "requirements.txt":
+            packages = _requirements(mirror, issue.get("environment_setup_commit") or issue["base_commit"]) + packages
+        elif spec.get("packages") and spec["packages"] != "environment.yml":
+            packages = spec["packages"].split() + packages
+
+        print(f"  Building environment {os.path.basename(env_dir)} ({len(packages)} packages)")
+        shutil.rmtree(env_dir, ignore_errors=True)
+        code, output = _run([_python_for(spec), "-m", "venv", env_dir], cwd=envs_dir)
+        if code == 0 and packages:
+            code, output = _run(["python", "-m", "pip", "install", *packages], cwd=envs_dir,
+                                env=_pip_env(settings, env_dir), timeout=settings["timeout"])
+        stamp = ".ready" if code == 0 else ".failed"
+        with open(env_dir + stamp, "w") as f:
+            f.write(output)
+        if code != 0:
+            raise EvaluationError("install_failed", f"Environment build failed, see {env_dir}.failed")
+        return env_dir
+
+
+def _worker_venv(issue: Dict, spec: Dict, mirror: str) -> str:
+    """
+    Get this worker's venv for an instance's (repo, version).
+
+    The venv is a thin layer over the shared dependency environment (linked
+    through a .pth file), so the project itself can be installed from this
+    worker's checkout without touching other workers.
+    """
+    key = (issue["repo"], str(issue.get("version")))
+    if key in _worker["venvs"]:
+        return _worker["venvs"][key]
+
+    shared = _shared_env(issue, spec, mirror)
+    venv = os.path.join(_worker["slot_dir"], "venvs", os.path.basename(shared))
+    shutil.rmtree(venv, ignore_errors=True)
+    code, output = _run([_python_for(spec), "-m", "venv", venv], cwd=_worker["slot_dir"])
+    if code != 0:
+        raise EvaluationError("install_failed", output)
+    with open(os.path.join(_site_packages(venv), "_shared_env.pth"), "w") as f:
+        f.write(_site_packages(shared) + "\n")
+
+    _worker["venvs"][key] = venv
+    return venv
+
+
+def _checkout(repo: str, mirror: str, commit: str) -> str:
+    """
+    Reset this worker's checkout of a repo to a commit.
+
+    The checkout is created once per worker with ``git clone --shared``,
+    which borrows the mirror's objects instead of copying them. Untracked
+    files are removed but ignored build artifacts are kept, so compiled
+    extensions survive between instances.
+    """
+    path = _worker["checkouts"].get(repo)
+    if path is None:
+        path = os.path.join(_worker["slot_dir"], _repo_dirname(repo))
+        if not os.path.isdir(os.path.join(path, ".git")):
+            shutil.rmtree(path, ignore_errors=True)
+            code, output = _run(["git", "clone", "--quiet", "--shared", "--no-checkout", mirror, path],
+                                cwd=_worker["slot_dir"])
+            if code != 0:
+                raise EvaluationError("repo_missing", output)
+        _worker["checkouts"][repo] = path
+
+    for cmd in (["git", "checkout", "--quiet", "--force", "--detach", commit], ["git", "clean", "-fdq"]):
+        code, output = _run(cmd, cwd=path)
+        if code != 0:
+            raise EvaluationError("repo_missing", output)
+    return path
+
+
+def _apply_patch(path: str, patch: str, failure_status: str):
+    """Apply a patch with git apply, falling back to a fuzzy patch(1)."""
+    patch_file = os.path.join(_worker["slot_dir"], "current.patch")
+    with open(patch_file, "w") as f:
+        f.write(patch if patch.endswith("\n") else patch + "\n")
+    for cmd in (["git", "apply", "--whitespace=nowarn", patch_file],
+                ["patch", "--batch", "--fuzz=5", "-p1", "-i", patch_file]):
+        code, output = _run(cmd, cwd=path)
+        if code == 0:
+            return
+    raise EvaluationError(failure_status, output)
+
+
+def _test_command(spec: Dict, issue: Dict) -> str:
+    """Test command for an instance, restricted to the tests its test_patch touches."""
+    test_cmd = spec.get("test_cmd", DEFAULT_TEST_CMD)
+    if isinstance(test_cmd, list):
+        test_cmd = " && ".join(test_cmd)
+    return " ".join([test_cmd] + get_test_directives(issue))
+
+
+def evaluate_instance(issue: Dict, diff: str) -> Dict:
+    """
+    Apply a diff to an instance's repo and run its tests (runs in a pool worker).
+
+    Args:
+        issue: Issue dictionary with repo, base_commit, version, test_patch,
+            FAIL_TO_PASS and PASS_TO_PASS
+        diff: Generated unified diff
+
+    Returns:
+        Evaluation record with instance_id, diff_hash, status, resolved,
+        per-list test counts, duration and log_path
+    """
+    settings = _worker["settings"]
+    start = time.perf_counter()
+    record = {"instance_id": issue["id"], "diff_hash": diff_hash(diff), "status": "error",
+              "resolved": False, "tests": {}, "duration": 0.0, "log_path": None}
+    log = []
+
+    try:
+        if not issue.get("test_patch") or not issue.get("base_commit"):
+            raise EvaluationError("missing_instance", "Issue has no test_patch or base_commit")
+        if "diff --git" not in diff and "--- " not in diff:
+            raise EvaluationError("patch_failed", "Generated PR has no diff")
+        mirror = _mirror_path(settings, issue["repo"])
+        if mirror is None:
+            raise EvaluationError("repo_missing", f"No mirror of {issue['repo']} in {settings['repos_dir']}")
+
+        spec = get_spec(issue, settings.get("specs", {}))
+        venv = _worker_venv(issue, spec, mirror)
+        path = _checkout(issue["repo"], mirror, issue["base_commit"])
+        env = _pip_env(settings, venv)
+
+        for cmd in spec.get("pre_install", []) + [spec.get("install", DEFAULT_INSTALL_CMD)]:
+            code, output = _run(cmd, cwd=path, env=env, timeout=settings["timeout"])
+            log.append(f"$ {cmd}\n{output}")
+            if code != 0:
+                raise EvaluationError("install_failed", f"Install step failed: {cmd}")
+
+        _apply_patch(path, diff, "patch_failed")
+        _apply_patch(path, issue["test_patch"], "test_patch_failed")
+
+        test_cmd = _test_command(spec, issue)
+        code, output = _run(_network_isolation() + ["bash", "-c", test_cmd], cwd=path, env=env,
+                            timeout=settings["timeout"])
+        log.append(f"$ {test_cmd}\n{output}")
+        resolved, tests = grade_log(issue, output, code)
+        record.update(status="resolved" if resolved else "unresolved", resolved=resolved, tests=tests)
+    except EvaluationError as e:
+        record["status"] = e.status
+        log.append(str(e))
+    except Exception as e:
+        log.append(f"Error evaluating {issue.get('id')}: {e}")
+
+    log_dir = os.path.join(os.path.abspath(settings["work_dir"]), "logs", _repo_dirname(str(issue.get("id"))))
+    ensure_directory(log_dir)
+    record["log_path"] = os.path.join(log_dir, f"{record['diff_hash'][:16]}.log")
+    with open(record["log_path"], "w") as f:
+        f.write("\n".join(log))
+    record["duration"] = time.perf_counter() - start
+    return record
+
+
+class GroundTruthEvaluator:
+    """
+    Runs evaluate_instance in a process pool with a persistent result cache.
+
+    submit() returns immediately with a Future, so runners can submit each
+    diff as soon as it is generated and collect results after scoring. Use
+    it as a context manager so the pool is torn down if the run fails.
+    """
+
+    def __init__(self, config: Dict):
+        """
+        Args:
+            config: Resolved run config (uses "swebench" and "results_dir")
+
+        Raises:
+            RuntimeError: If another run holds every slot in work_dir
+        """
+        self.settings = dict(config["swebench"])
+        free_slots = count_free_slots(self.settings)
+        if not free_slots:
+            raise RuntimeError(f"All {self.settings['workers']} evaluation slots in {self.settings['work_dir']} "
+                               f"are held by another run. Wait for it or set a different swebench work_dir.")
+        if free_slots < self.settings["workers"]:
+            print(f"Only {free_slots} of {self.settings['workers']} evaluation slots are free, using {free_slots} workers")
+        self.cache_path = self.settings.get("cache_path") or os.path.join(config["results_dir"], "eval_cache.jsonl")
+        self.cache = self._load_cache()
+        self._pending = {}
+        # Not forked: the parent has generation threads and locks held mid-run
+        self._executor = ProcessPoolExecutor(max_workers=free_slots,
+                                             mp_context=multiprocessing.get_context("forkserver"),
+                                             initializer=_init_worker, initargs=(self.settings,))
+        self.status_counts = Counter()
+
+    def _load_cache(self) -> Dict[Tuple[str, str], Dict]:
+        """Load cached evaluation records keyed by (instance_id, diff_hash)."""
+        cache = {}
+        if os.path.exists(self.cache_path):
+            with open(self.cache_path) as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        cache[(record["instance_id"], record["diff_hash"])] = record
+        return cache
+
+    def _store(self, future: Future):
+        """Count a finished evaluation and append cacheable results to the cache file."""
+        if future.cancelled() or future.exception() is not None:
+            return
+        record = future.result()
+        self.status_counts[record["status"]] += 1
+        key = (record["instance_id"], record["diff_hash"])
+        if record["status"] in LABELED_STATUSES and key not in self.cache:
+            self.cache[key] = record
+            ensure_directory(os.path.dirname(self.cache_path) or ".")
+            with open(self.cache_path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+
+    def submit(self, issue: Dict, diff: str) -> Future:
+        """
+        Schedule the evaluation of a diff.
+
+        Args:
+            issue: Issue dictionary
+            diff: Generated unified diff
+
+        Returns:
+            Future resolving to the evaluation record (already done on a cache hit)
+        """
+        key = (issue["id"], diff_hash(diff))
+        if key in self.cache:
+            future = Future()
+            future.set_result({**self.cache[key], "cached": True})
+            self.status_counts[self.cache[key]["status"]] += 1
+            return future
+        if key not in self._pending:
+            future = self._executor.submit(evaluate_instance, issue, diff)
+            future.add_done_callback(self._store)
+            self._pending[key] = future
+        return self._pending[key]
+
+    def skip(self, issue: Dict, status: str) -> Future:
+        """
+        Record a PR that is not evaluated, e.g. because generation failed.
+
+        The outcome is counted but not cached, and the PR stays unlabeled.
+
+        Args:
+            issue: Issue dictionary
+            status: Outcome to record (not one of LABELED_STATUSES)
+
+        Returns:
+            Future already resolved to the evaluation record
+        """
+        future = Future()
+        future.set_result({"instance_id": issue["id"], "diff_hash": None, "status": status, "resolved": False,
+                           "tests": {}, "duration": 0.0, "log_path": None})
+        self.status_counts[status] += 1
+        return future
+
+    def close(self, cancel: bool = False):
+        """
+        Shut down the worker pool.
+
+        Args:
+            cancel: Drop queued evaluations and stop running ones instead of
+                waiting for them (used when the run fails)
+        """
+        if not cancel:
+            self._executor.shutdown(wait=True)
+            return
+        processes = list((self._executor._processes or {}).values())
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close(cancel=exc_type is not None)
+
+
+def resolve_ground_truth(futures: List[Future]) -> List[Optional[int]]:
+    """
+    Wait for evaluations and convert them to ground-truth labels.
+
+    Args:
+        futures: Evaluation futures in row order
+
+    Returns:
+        1 for resolved PRs, 0 for unresolved PRs and diffs that do not
+        apply, None when the evaluation itself failed (missing repo or
+        instance data, install failure, timeout, worker error)
+    """
+    labels = []
+    for future in futures:
+        try:
+            record = future.result()
+        except Exception as e:
+            print(f"Error evaluating PR: {e}")
+            labels.append(None)
+            continue
+        labels.append(int(record["resolved"]) if record["status"] in LABELED_STATUSES else None)
+    return labels
@@ -2,30 +2,79 @@
 Simple experiment runner using inspect_ai pipeline.
 """
 
-import random
+import contextlib
+import time
 import pandas as pd
-from typing import List, Dict
-from .scorer import score_pr, generate_pr, score_prs_batch
+from typing import List, Dict, Optional, Union
+from .scorer import generate_pr, score_prs_batch
 from .dataset import create_experiment_dataset
+from .config import DEFAULT_CONFIG
+from .batch import score_results_offline
+from .analysis import RatingStats
+from .records import ResultColumns
+from .sampling import derive_seed, seeded_choice, rate_pr_paired, run_precision_reached
+from .evaluation import GroundTruthEvaluator, resolve_ground_truth
 from concurrent.futures import ThreadPoolExecutor
 
 
-def load_issues(n: int = 20) -> List[Dict]:
+def _resolve_dataset_revision(dataset_name: str, revision: Optional[str]) -> Optional[str]:
+    """
+    Resolve a dataset revision (None for the default branch) to its Hub commit.
+
+    Args:
+        dataset_name: Hugging Face dataset name
+        revision: Requested revision (git tag, branch or commit), None for latest
+
+    Returns:
+        Commit sha, or None if the Hub cannot be reached
+    """
+    try:
+        from huggingface_hub import HfApi
+        return HfApi().dataset_info(dataset_name, revision=revision).sha
+    except Exception as e:
+        print(f"Warning: could not resolve the revision of {dataset_name}: {e}")
+        return None
+
+
+def load_issues(n: int = 20, dataset_name: str = "princeton-nlp/SWE-bench", split: str = "test",
+                revision: Optional[str] = None, dataset_info: Optional[Dict] = None) -> List[Dict]:
     """
     Load real SWE-bench issues.
     
     Args:
         n: Number of issues to load (default: 20)
+        dataset_name: Hugging Face dataset name
+        split: Dataset split
+        revision: Dataset revision (git tag, branch or commit) to pin, None for latest
+        dataset_info: Optional dictionary filled with the resolved dataset source
+            and the Hub commit the revision resolved to
     
     Returns:
         List of real SWE-bench issue dictionaries
     """
+    if dataset_info is not None:
+        dataset_info.update({
+            "name": dataset_name,
+            "split": split,
+            "requested_revision": revision,
+            "revision": None,
+            "fingerprint": None,
+            "source": "sample"
+        })
+    
     try:
         # Import datasets library
         from datasets import load_dataset
         
-        # Load SWE-bench dataset from Hugging Face
-        dataset = load_dataset("princeton-nlp/SWE-bench", split="test")
+        # Load SWE-bench dataset from Hugging Face, pinned to the commit the
+        # requested revision resolves to so the manifest names the exact data
+        resolved_revision = _resolve_dataset_revision(dataset_name, revision)
+        dataset = load_dataset(dataset_name, split=split, revision=resolved_revision or revision)
+        
+        if dataset_info is not None:
+            dataset_info["revision"] = resolved_revision
+            dataset_info["fingerprint"] = getattr(dataset, "_fingerprint", None)
+            dataset_info["source"] = "huggingface"
         
         # Get sample issues (first n issues)
         issues = []
@@ -51,8 +100,13 @@ def load_issues(n: int = 20) -> List[Dict]:
                 "description": problem_statement,
                 "repo": item.get("repo", "unknown-repo"),
                 "base_commit": item.get("base_commit", "unknown-commit"),
-                "test_patch": item.get("test_patch", "")[:500] + "..." if len(item.get("test_patch", "")) > 500 else item.get("test_patch", ""),
-                "test_file": item.get("test_file", "")
+                "test_patch": item.get("test_patch", ""),
+                "test_file": item.get("test_file", ""),
+                # Needed to evaluate generated diffs against the instance's tests
+                "version": item.get("version", ""),
+                "environment_setup_commit": item.get("environment_setup_commit", ""),
+                "FAIL_TO_PASS": item.get("FAIL_TO_PASS", "[]"),
+                "PASS_TO_PASS": item.get("PASS_TO_PASS", "[]")
             }
             issues.append(issue)
             
@@ -93,117 +147,312 @@ def _get_sample_issues(n: int) -> List[Dict]:
     return sample_issues
 
 
-def run_sequential_experiment(n_issues: int = 20) -> pd.DataFrame:
+def _resolve_run_config(config: Optional[Dict]) -> Dict:
+    """Merge run settings over DEFAULT_CONFIG."""
+    return {**DEFAULT_CONFIG, **(config or {})}
+
+
+def _load_run_issues(n_issues: int, config: Dict, dataset_info: Dict) -> List[Dict]:
+    """Load issues from the dataset source named in the run config."""
+    return load_issues(
+        n_issues,
+        dataset_name=config["dataset_name"],
+        split=config["dataset_split"],
+        revision=config["dataset_revision"],
+        dataset_info=dataset_info
+    )
+
+
+def _sampling_kwargs(config: Dict) -> Dict:
+    """Sampling settings for judging calls."""
+    return {"temperature": config["temperature"], "max_tokens": config["max_tokens"]}
+
+
+def _generation_kwargs(config: Dict) -> Dict:
+    """Sampling settings for PR generation calls."""
+    return {"temperature": config["temperature"], "max_tokens": config["generator_max_tokens"]}
+
+
+def _sampling_summary(results: ResultColumns, stopped_early: bool) -> Dict:
+    """Summarize how many issues and rating samples a run used."""
+    return {
+        "issues_rated": len(results),
+        "total_samples": int(sum(results.n_samples)),
+        "stopped_early": stopped_early
+    }
+
+
+def _evaluation_pool(config: Dict):
+    """
+    Context manager for the ground-truth evaluation pool.
+
+    Yields a GroundTruthEvaluator when the run config asks for test-based
+    ground truth, otherwise None. The pool is torn down when the block
+    exits, and pending evaluations are cancelled if the run fails.
+    """
+    if config["ground_truth"] != "swebench":
+        return contextlib.nullcontext()
+    print(f"Evaluating generated diffs with {config['swebench']['workers']} test workers")
+    return GroundTruthEvaluator(config)
+
+
+def _ground_truth(evaluator: Optional[GroundTruthEvaluator], issue: Dict, pr: Dict, issue_seed: Optional[int],
+                  eval_futures: List) -> Optional[int]:
+    """
+    Ground truth for a row: a seeded coin flip, or unlabeled (None) while the
+    PR's evaluation runs in the background (filled in by _finish_evaluation).
+    PRs whose generation failed are not evaluated and stay unlabeled.
+    """
+    if evaluator is None:
+        return seeded_choice(derive_seed(issue_seed, "ground_truth"), [0, 1])
+    if pr.get("generated", True):
+        eval_futures.append(evaluator.submit(issue, pr["diff"]))
+    else:
+        eval_futures.append(evaluator.skip(issue, "generation_failed"))
+    return None
+
+
+def _finish_evaluation(evaluator: Optional[GroundTruthEvaluator], eval_futures: List,
+                       results: ResultColumns, timings: Dict) -> Dict:
+    """Wait for outstanding evaluations, fill in ground truth and summarize outcomes."""
+    if evaluator is None:
+        return {}
+    print("Waiting for test evaluations...")
+    start = time.perf_counter()
+    labels = resolve_ground_truth(eval_futures)
+    for index, label in enumerate(labels):
+        results.set_ground_truth(index, label)
+    unlabeled = labels.count(None)
+    if unlabeled:
+        print(f"Warning: {unlabeled} of {len(labels)} PRs could not be evaluated; "
+              f"their ground truth is missing and left out of the correlations")
+    timings["evaluate"] = time.perf_counter() - start
+    counts = dict(evaluator.status_counts)
+    print(f"Evaluation outcomes: {counts}")
+    return counts
+
+
+def run_sequential_experiment(n_issues: int = 20, config: Optional[Dict] = None) -> pd.DataFrame:
     """
     Run experiment sequentially.
     
     Args:
         n_issues: Number of issues to process
+        config: Optional run settings (models, sampling, seed, stopping rules,
+            dataset), see DEFAULT_CONFIG
         
     Returns:
-        DataFrame with results
+        DataFrame with results. ``df.attrs`` holds the resolved dataset
+        source ("dataset"), per-phase wall-clock seconds ("timings"),
+        sample counts ("sampling") and ground-truth evaluation outcomes
+        ("evaluation").
     """
-    print(f"Loading {n_issues} issues...")
-    issues = load_issues(n_issues)
+    config = _resolve_run_config(config)
+    dataset_info = {}
+    timings = {"load": 0.0, "generate": 0.0, "score": 0.0}
     
-    results = []
+    print(f"Loading {n_issues} issues...")
+    start = time.perf_counter()
+    issues = _load_run_issues(n_issues, config, dataset_info)
+    timings["load"] = time.perf_counter() - start
     
-    for i, issue in enumerate(issues, 1):
-        print(f"Processing issue {i}/{n_issues}: {issue['title']}")
-        
-        # Generate PR using inspect_ai
-        pr = generate_pr(issue)
+    offline_scoring = config["scoring_mode"] == "batch"
+    results = ResultColumns()
+    run_stats = RatingStats()
+    stopped_early = False
+    prs = []
+    issue_seeds = []
+    with _evaluation_pool(config) as evaluator:
+        eval_futures = []
         
-        # Score using inspect_ai
-        rating_self = score_pr(pr, framing="self")
-        rating_other = score_pr(pr, framing="other")
-        
-        # Ground truth
-        ground_truth = random.choice([0, 1])
+        for i, issue in enumerate(issues, 1):
+            print(f"Processing issue {i}/{n_issues}: {issue['title']}")
+            issue_seed = derive_seed(config["seed"], issue["id"])
+            issue_seeds.append(issue_seed)
+            
+            # Generate PR using inspect_ai
+            start = time.perf_counter()
+            pr = generate_pr(issue, model=config["generator_model"], seed=derive_seed(issue_seed, "generate"),
+                             **_generation_kwargs(config))
+            timings["generate"] += time.perf_counter() - start
+            prs.append(pr)
+            
+            # Ground truth (evaluated in the background while the PR is scored)
+            ground_truth = _ground_truth(evaluator, issue, pr, issue_seed, eval_futures)
+            
+            # Score using inspect_ai (deferred to one batch job in offline mode)
+            rating_self = rating_other = None
+            n_samples = 1
+            if not offline_scoring:
+                start = time.perf_counter()
+                rating_self, rating_other, n_samples = rate_pr_paired(pr, issue_seed, config)
+                timings["score"] += time.perf_counter() - start
+            
+            results.append(issue["id"], issue["title"], pr["title"], rating_self, rating_other, ground_truth, n_samples)
+            
+            if not offline_scoring:
+                print(f"  Issue {i} completed - Self: {rating_self}, Other: {rating_other} ({n_samples} samples)")
+                run_stats.update_arrays([rating_self], [rating_other], [ground_truth])
+                if run_precision_reached(run_stats, config):
+                    print(f"Confidence interval target reached after {i} issues, stopping early")
+                    stopped_early = True
+                    break
         
-        results.append({
-            "issue_id": issue["id"],
-            "issue_title": issue["title"],
-            "pr_title": pr["title"],
-            "rating_self": rating_self,
-            "rating_other": rating_other,
-            "ground_truth": ground_truth,
-            "self_other_diff": rating_self - rating_other
-        })
+        if offline_scoring:
+            print("Rating PRs through the batch API...")
+            start = time.perf_counter()
+            score_results_offline(results, prs, config, seeds=[derive_seed(seed, "judge", 0) for seed in issue_seeds])
+            timings["score"] = time.perf_counter() - start
+            for i, record in enumerate(results, 1):
+                print(f"  Issue {i} completed - Self: {record.rating_self}, Other: {record.rating_other}")
         
-        print(f"  Issue {i} completed - Self: {rating_self}, Other: {rating_other}")
+        evaluation = _finish_evaluation(evaluator, eval_futures, results, timings)
     
-    return pd.DataFrame(results)
+    df = results.to_frame()
+    df.attrs["dataset"] = dataset_info
+    df.attrs["timings"] = timings
+    df.attrs["sampling"] = _sampling_summary(results, stopped_early)
+    df.attrs["evaluation"] = evaluation
+    return df
 
 
-def run_parallel_experiment(n_issues: int = 20, max_workers: int = 5) -> pd.DataFrame:
+def run_parallel_experiment(n_issues: int = 20, max_workers: int = 5,
+                            config: Optional[Dict] = None) -> pd.DataFrame:
     """
     Run experiment with parallel processing.
     
+    Issues are processed in one wave, or in waves of max_workers issues
+    when run_ci_half_width is set so the run can stop early between waves.
+    
     Args:
         n_issues: Number of issues to process
         max_workers: Maximum parallel workers
+        config: Optional run settings (models, sampling, seed, stopping rules,
+            dataset), see DEFAULT_CONFIG
         
     Returns:
-        DataFrame with results
+        DataFrame with results. ``df.attrs`` holds the resolved dataset
+        source ("dataset"), per-phase wall-clock seconds ("timings"),
+        sample counts ("sampling") and ground-truth evaluation outcomes
+        ("evaluation").
     """
+    config = _resolve_run_config(config)
+    sampling = _sampling_kwargs(config)
+    dataset_info = {}
+    timings = {"load": 0.0, "generate": 0.0, "score": 0.0}
+    
     print(f"Loading {n_issues} issues for parallel processing...")
-    issues = load_issues(n_issues)
+    start = time.perf_counter()
+    issues = _load_run_issues(n_issues, config, dataset_info)
+    timings["load"] = time.perf_counter() - start
     
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # Generate all PRs in parallel
-        pr_futures = {
-            executor.submit(generate_pr, issue): issue 
-            for issue in issues
-        }
+    offline_scoring = config["scoring_mode"] == "batch"
+    adaptive_run = config["run_ci_half_width"] is not None and not offline_scoring
+    wave_size = max_workers if adaptive_run else max(len(issues), 1)
+    
+    results = ResultColumns()
+    run_stats = RatingStats()
+    stopped_early = False
+    prs = []
+    issue_seeds = [derive_seed(config["seed"], issue["id"]) for issue in issues]
+    with _evaluation_pool(config) as evaluator:
+        eval_futures = []
         
-        prs = []
-        for future in pr_futures:
-            try:
-                pr = future.result()
-                prs.append(pr)
-            except Exception as e:
-                print(f"Error generating PR: {e}")
-                prs.append({"title": "Error", "body": "Error", "diff": "Error"})
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for wave_start in range(0, len(issues), wave_size):
+                wave_issues = issues[wave_start:wave_start + wave_size]
+                wave_seeds = issue_seeds[wave_start:wave_start + wave_size]
+                
+                # Generate the wave's PRs in parallel
+                start = time.perf_counter()
+                pr_futures = {
+                    executor.submit(generate_pr, issue, config["generator_model"],
+                                    seed=derive_seed(seed, "generate"), **_generation_kwargs(config)): issue
+                    for issue, seed in zip(wave_issues, wave_seeds)
+                }
+                
+                wave_prs = []
+                for future, issue in pr_futures.items():
+                    try:
+                        pr = future.result()
+                        wave_prs.append(pr)
+                    except Exception as e:
+                        print(f"Error generating PR: {e}")
+                        wave_prs.append({"issue_id": issue["id"], "title": "Error", "body": "Error", "diff": "Error",
+                                         "generated": False})
+                timings["generate"] += time.perf_counter() - start
+                prs.extend(wave_prs)
+                
+                # Start test evaluations so they overlap with scoring
+                ground_truths = [_ground_truth(evaluator, issue, pr, seed, eval_futures)
+                                 for issue, pr, seed in zip(wave_issues, wave_prs, wave_seeds)]
+                
+                if offline_scoring:
+                    rated = [(None, None, 1)] * len(wave_prs)
+                else:
+                    # Score the wave's PRs using inspect_ai, pairing framings under one seed
+                    print("Rating PRs using inspect_ai framework...")
+                    start = time.perf_counter()
+                    if config["max_samples_per_issue"] == 1:
+                        judge_seeds = [derive_seed(seed, "judge", 0) for seed in wave_seeds]
+                        self_ratings = score_prs_batch(wave_prs, "self", config["judge_model"], seeds=judge_seeds, **sampling)
+                        other_ratings = score_prs_batch(wave_prs, "other", config["judge_model"], seeds=judge_seeds, **sampling)
+                        rated = [(s, o, 1) for s, o in zip(self_ratings, other_ratings)]
+                    else:
+                        rated = list(executor.map(lambda pr, seed: rate_pr_paired(pr, seed, config), wave_prs, wave_seeds))
+                    timings["score"] += time.perf_counter() - start
+                
+                # Compile results
+                for issue, pr, ground_truth, (rating_self, rating_other, n_samples) in zip(wave_issues, wave_prs, ground_truths, rated):
+                    results.append(issue["id"], issue["title"], pr["title"], rating_self, rating_other, ground_truth, n_samples)
+                    if not offline_scoring:
+                        run_stats.update_arrays([rating_self], [rating_other], [ground_truth])
+                
+                if adaptive_run and run_precision_reached(run_stats, config):
+                    print(f"Confidence interval target reached after {len(results)} issues, stopping early")
+                    stopped_early = len(results) < len(issues)
+                    break
         
-        # Score all PRs in parallel using inspect_ai
-        print("Rating PRs using inspect_ai framework...")
-        self_ratings = score_prs_batch(prs, "self")
-        other_ratings = score_prs_batch(prs, "other")
+        if offline_scoring:
+            print("Rating PRs through the batch API...")
+            start = time.perf_counter()
+            score_results_offline(results, prs, config, seeds=[derive_seed(seed, "judge", 0) for seed in issue_seeds])
+            timings["score"] = time.perf_counter() - start
         
-        # Compile results
-        results = []
-        for i, (issue, pr, self_rating, other_rating) in enumerate(zip(issues, prs, self_ratings, other_ratings), 1):
-            ground_truth = random.choice([0, 1])
-            results.append({
-                "issue_id": issue["id"],
-                "issue_title": issue["title"],
-                "pr_title": pr["title"],
-                "rating_self": self_rating,
-                "rating_other": other_rating,
-                "ground_truth": ground_truth,
-                "self_other_diff": self_rating - other_rating
-            })
-            print(f"  Issue {i} completed - Self: {self_rating}, Other: {other_rating}")
-    
-    return pd.DataFrame(results)
-
-
-def calculate_metrics(df: pd.DataFrame) -> Dict:
+        evaluation = _finish_evaluation(evaluator, eval_futures, results, timings)
+    
+    for i, record in enumerate(results, 1):
+        print(f"  Issue {i} completed - Self: {record.rating_self}, Other: {record.rating_other} ({record.n_samples} samples)")
+    
+    df = results.to_frame()
+    df.attrs["dataset"] = dataset_info
+    df.attrs["timings"] = timings
+    df.attrs["sampling"] = _sampling_summary(results, stopped_early)
+    df.attrs["evaluation"] = evaluation
+    return df
+
+
+def calculate_metrics(df: Union[pd.DataFrame, ResultColumns]) -> Dict:
     """
     Calculate experiment metrics.
     
+    Metrics are derived from mergeable RatingStats, the same aggregate
+    state pipeline.analysis keeps per run and per repo. Missing values are
+    skipped per column, and pairwise for correlations, as in pandas.
+    
     Args:
-        df: DataFrame with results
+        df: DataFrame or ResultColumns with results
         
     Returns:
         Dictionary with metrics
     """
+    if isinstance(df, ResultColumns):
+        stats = RatingStats.from_arrays(df.rating_self, df.rating_other, df.ground_truth)
+    else:
+        stats = RatingStats.from_frame(df)
+    metrics = stats.metrics()
     return {
-        "mean_self": df["rating_self"].mean(),
-        "mean_other": df["rating_other"].mean(),
-        "mean_self_other_diff": df["self_other_diff"].mean(),
-        "correlation_self_ground_truth": df["rating_self"].corr(df["ground_truth"]),
-        "correlation_other_ground_truth": df["rating_other"].corr(df["ground_truth"]),
-        "total_issues": len(df)
+        key: metrics[key]
+        for key in ["mean_self", "mean_other", "mean_self_other_diff",
+                    "correlation_self_ground_truth", "correlation_other_ground_truth", "total_issues"]
     }
@@ -0,0 +1,197 @@
+"""
+Compact in-memory experiment results.
+
+Runners append rows to a ResultColumns accumulator instead of building a
+list of per-row dicts. Numeric columns live in typed arrays and string
+columns are interned into per-column pools with integer codes, so repeated
+issue ids and titles are stored once. to_frame() builds the results
+DataFrame column by column, without per-row Python objects.
+"""
+
+from array import array
+from typing import Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+class ResultRecord:
+    """
+    One experiment result row.
+    """
+
+    __slots__ = ("issue_id", "issue_title", "pr_title", "rating_self", "rating_other", "ground_truth", "n_samples")
+
+    def __init__(self, issue_id: str, issue_title: str, pr_title: str,
+                 rating_self: float, rating_other: float, ground_truth: float, n_samples: int = 1):
+        self.issue_id = issue_id
+        self.issue_title = issue_title
+        self.pr_title = pr_title
+        self.rating_self = rating_self
+        self.rating_other = rating_other
+        self.ground_truth = ground_truth
+        self.n_samples = n_samples
+
+    @property
+    def self_other_diff(self) -> float:
+        """Self rating minus other rating."""
+        return self.rating_self - self.rating_other
+
+
+class StringPool:
+    """
+    Interns strings to integer codes, storing each distinct string once.
+    """
+
+    __slots__ = ("values", "_codes")
+
+    def __init__(self):
+        self.values = []
+        self._codes = {}
+
+    def intern(self, value: str) -> int:
+        """
+        Get the code for a string, adding it to the pool if new.
+
+        Args:
+            value: String to intern
+
+        Returns:
+            Integer code
+        """
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self._codes[value] = code
+            self.values.append(value)
+        return code
+
+
+# Rating value for rows not scored yet (e.g. awaiting a batch job)
+UNSCORED = float("nan")
+
+# Ground truth value for rows without a label (e.g. the test run failed)
+UNLABELED = float("nan")
+
+
+class ResultColumns:
+    """
+    Columnar accumulator for experiment results.
+
+    Ratings are stored in float64 arrays (NaN while unscored), ground truth
+    in a float64 array (NaN when unlabeled), the number of paired rating samples behind each row in
+    a uint16 array and issue_id, issue_title and pr_title as uint32 codes
+    into per-column StringPools.
+    """
+
+    STRING_COLUMNS = ("issue_id", "issue_title", "pr_title")
+
+    def __init__(self):
+        self._pools = {name: StringPool() for name in self.STRING_COLUMNS}
+        self._codes = {name: array("I") for name in self.STRING_COLUMNS}
+        self.rating_self = array("d")
+        self.rating_other = array("d")
+        self.ground_truth = array("d")
+        self.n_samples = array("H")
+
+    def __len__(self) -> int:
+        return len(self.rating_self)
+
+    def append(self, issue_id: str, issue_title: str, pr_title: str, rating_self: Optional[float] = None,
+               rating_other: Optional[float] = None, ground_truth: Optional[int] = None, n_samples: int = 1):
+        """
+        Append a result row.
+
+        Args:
+            issue_id: Issue identifier
+            issue_title: Issue title
+            pr_title: Generated PR title
+            rating_self: Rating under the "self" framing (None if not scored yet)
+            rating_other: Rating under the "other" framing (None if not scored yet)
+            ground_truth: Ground truth label (0 or 1, None if unlabeled yet)
+            n_samples: Number of paired rating samples averaged into the ratings
+        """
+        for name, value in zip(self.STRING_COLUMNS, (issue_id, issue_title, pr_title)):
+            self._codes[name].append(self._pools[name].intern(value))
+        self.rating_self.append(UNSCORED if rating_self is None else rating_self)
+        self.rating_other.append(UNSCORED if rating_other is None else rating_other)
+        self.ground_truth.append(UNLABELED if ground_truth is None else ground_truth)
+        self.n_samples.append(n_samples)
+
+    def _string(self, name: str, index: int) -> str:
+        """Look up a string column value for a row."""
+        return self._pools[name].values[self._codes[name][index]]
+
+    def __getitem__(self, index: int) -> ResultRecord:
+        return ResultRecord(
+            self._string("issue_id", index),
+            self._string("issue_title", index),
+            self._string("pr_title", index),
+            self.rating_self[index],
+            self.rating_other[index],
+            self.ground_truth[index],
+            self.n_samples[index]
+        )
+
+    def __iter__(self) -> Iterator[ResultRecord]:
+        return (self[index] for index in range(len(self)))
+
+    def issue_ids(self) -> List[str]:
+        """
+        Issue ids in row order.
+
+        Returns:
+            List of issue ids
+        """
+        values = self._pools["issue_id"].values
+        return [values[code] for code in self._codes["issue_id"]]
+
+    def set_ratings(self, index: int, rating_self: float, rating_other: float):
+        """
+        Fill in the ratings of a row.
+
+        Args:
+            index: Row index
+            rating_self: Rating under the "self" framing
+            rating_other: Rating under the "other" framing
+        """
+        self.rating_self[index] = rating_self
+        self.rating_other[index] = rating_other
+
+    def set_ground_truth(self, index: int, ground_truth: Optional[int]):
+        """
+        Fill in the ground truth label of a row.
+
+        Args:
+            index: Row index
+            ground_truth: Ground truth label (0 or 1, None if unlabeled)
+        """
+        self.ground_truth[index] = UNLABELED if ground_truth is None else ground_truth
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Build the results DataFrame.
+
+        Numeric columns are single buffer copies of the arrays and string
+        columns are categoricals over the interned pools.
+
+        Returns:
+            DataFrame with the standard results columns
+        """
+        rating_self = np.array(self.rating_self, dtype=np.float64)
+        rating_other = np.array(self.rating_other, dtype=np.float64)
+        columns = {
+            name: pd.Categorical.from_codes(
+                np.array(self._codes[name], dtype=np.int32),
+                categories=pd.Index(self._pools[name].values, dtype=object)
+            )
+            for name in self.STRING_COLUMNS
+        }
+        columns.update({
+            "rating_self": rating_self,
+            "rating_other": rating_other,
+            "ground_truth": np.array(self.ground_truth, dtype=np.float64),
+            "self_other_diff": rating_self - rating_other,
+            "n_samples": np.array(self.n_samples, dtype=np.uint16)
+        })
+        return pd.DataFrame(columns, copy=False)
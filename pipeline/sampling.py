@@ -0,0 +1,183 @@
+"""
+Deterministic seeding and variance-reduction sampling.
+
+Every random choice in a run is driven by seeds derived from the run seed,
+so a seeded run is reproducible regardless of worker scheduling. The self
+and other framings of a PR are rated under the same seed (paired sampling),
+which cancels shared sampling noise out of self_other_diff. Sequential
+stopping rules end sampling for an issue, or the whole run, once the
+Student t confidence interval on self_other_diff is tight enough.
+"""
+
+import hashlib
+import math
+import random
+from functools import lru_cache
+from statistics import mean, stdev
+from typing import Dict, Optional, Tuple
+
+from .analysis import RatingStats
+from .scorer import score_pr
+
+
+# Ratings are whole numbers, so a few tied samples are no evidence that a
+# self_other_diff has no spread. Its sample standard deviation is floored
+# at that of the rounding error of two integer ratings, sqrt(2/12).
+RATING_DIFF_RESOLUTION = math.sqrt(2 / 12)
+
+
+def derive_seed(base_seed: Optional[int], *parts) -> Optional[int]:
+    """
+    Derive a stable 31-bit seed from a base seed and identifying parts.
+
+    Args:
+        base_seed: Run or parent seed (None for unseeded runs)
+        *parts: Values identifying the draw, e.g. issue id and sample index
+
+    Returns:
+        Derived seed, or None if base_seed is None
+    """
+    if base_seed is None:
+        return None
+    key = ":".join(str(part) for part in (base_seed,) + parts)
+    return int(hashlib.sha256(key.encode("utf-8")).hexdigest()[:8], 16) & 0x7FFFFFFF
+
+
+def seeded_choice(seed: Optional[int], options):
+    """
+    Pick one option, reproducibly when seeded.
+
+    Args:
+        seed: Seed for this choice (None uses the global random module)
+        options: Sequence of options
+
+    Returns:
+        Chosen option
+    """
+    if seed is None:
+        return random.choice(options)
+    return random.Random(seed).choice(options)
+
+
+def _t_two_sided(t: float, df: int) -> float:
+    """
+    Probability that a Student t variable with df degrees of freedom lies in [-t, t].
+
+    Uses the closed forms for integer degrees of freedom (Abramowitz and
+    Stegun 26.7.3 and 26.7.4).
+    """
+    theta = math.atan(t / math.sqrt(df))
+    sin, cos2 = math.sin(theta), math.cos(theta) ** 2
+    if df % 2:
+        series = term = math.cos(theta) if df > 1 else 0.0
+        for i in range(3, df - 1, 2):
+            term *= cos2 * (i - 1) / i
+            series += term
+        return 2 / math.pi * (theta + sin * series)
+    series = term = 1.0
+    for i in range(2, df - 1, 2):
+        term *= cos2 * (i - 1) / i
+        series += term
+    return sin * series
+
+
+@lru_cache(maxsize=None)
+def t_critical(confidence: float, df: int) -> float:
+    """
+    Two-sided Student t critical value.
+
+    Args:
+        confidence: Confidence level
+        df: Degrees of freedom
+
+    Returns:
+        t such that a t variable with df degrees of freedom lies in [-t, t]
+        with probability confidence
+    """
+    low, high = 0.0, 1.0
+    while _t_two_sided(high, df) < confidence:
+        low, high = high, high * 2
+    for _ in range(60):
+        middle = (low + high) / 2
+        if _t_two_sided(middle, df) < confidence:
+            low = middle
+        else:
+            high = middle
+    return high
+
+
+def ci_half_width(std: float, n: int, confidence: float = 0.95, min_std: float = 0.0) -> float:
+    """
+    Student t confidence interval half-width for a mean.
+
+    Args:
+        std: Sample standard deviation
+        n: Sample size
+        confidence: Confidence level
+        min_std: Floor applied to std
+
+    Returns:
+        Half-width of the interval (inf if fewer than 2 samples)
+    """
+    if n < 2 or math.isnan(std):
+        return math.inf
+    return t_critical(confidence, n - 1) * max(std, min_std) / math.sqrt(n)
+
+
+def rate_pr_paired(pr: Dict, issue_seed: Optional[int], config: Dict) -> Tuple[float, float, int]:
+    """
+    Rate a PR under both framings, resampling until the estimate is tight.
+
+    Each sample rates the self and other framings with the same seed. After
+    min_samples_per_issue samples, sampling stops as soon as the t
+    confidence interval half-width on the issue's self_other_diff (with the
+    spread floored at RATING_DIFF_RESOLUTION) is at most issue_ci_half_width,
+    or after max_samples_per_issue samples.
+
+    Args:
+        pr: PR dictionary
+        issue_seed: Seed for this issue (None for unseeded sampling)
+        config: Resolved run config (judge model, sampling and stopping settings)
+
+    Returns:
+        Tuple of (mean self rating, mean other rating, number of samples)
+    """
+    sampling = {"temperature": config["temperature"], "max_tokens": config["max_tokens"]}
+    target = config["issue_ci_half_width"]
+    min_samples = config["min_samples_per_issue"]
+
+    self_ratings, other_ratings, diffs = [], [], []
+    for sample in range(config["max_samples_per_issue"]):
+        seed = derive_seed(issue_seed, "judge", sample)
+        rating_self = score_pr(pr, "self", config["judge_model"], seed=seed, **sampling)
+        rating_other = score_pr(pr, "other", config["judge_model"], seed=seed, **sampling)
+        self_ratings.append(rating_self)
+        other_ratings.append(rating_other)
+        diffs.append(rating_self - rating_other)
+
+        n = len(diffs)
+        if target is not None and n >= max(min_samples, 2):
+            if ci_half_width(stdev(diffs), n, config["confidence"], RATING_DIFF_RESOLUTION) <= target:
+                break
+
+    return mean(self_ratings), mean(other_ratings), len(diffs)
+
+
+def run_precision_reached(stats: RatingStats, config: Dict) -> bool:
+    """
+    Check whether a run can stop adding issues.
+
+    Args:
+        stats: Stats over the issues rated so far
+        config: Resolved run config
+
+    Returns:
+        True once at least min_issues are rated and the confidence interval
+        half-width on mean self_other_diff is at most run_ci_half_width
+    """
+    target = config["run_ci_half_width"]
+    if target is None or stats.count < config["min_issues"]:
+        return False
+    metrics = stats.metrics()
+    return ci_half_width(metrics["std_self_other_diff"], stats.column_count("self_other_diff"),
+                         config["confidence"]) <= target
@@ -5,10 +5,11 @@ Utility functions for the inspect_ai pipeline.
 import os
 import matplotlib.pyplot as plt
 import pandas as pd
-from typing import Dict
+from typing import Dict, List, Optional
 
 
-def save_results(df: pd.DataFrame, metrics: Dict, output_dir: str = "results"):
+def save_results(df: pd.DataFrame, metrics: Dict, output_dir: str = "results",
+                 formats: Optional[List[str]] = None) -> List[str]:
     """
     Save results and create visualization.
     
@@ -16,15 +17,61 @@ def save_results(df: pd.DataFrame, metrics: Dict, output_dir: str = "results"):
         df: DataFrame with experiment results
         metrics: Dictionary with calculated metrics
         output_dir: Directory to save outputs (default: results)
+        formats: Outputs to write, any of "csv", "jsonl", "parquet" and "plot"
+            (default: csv and plot)
+        
+    Returns:
+        List of paths written
     """
+    if formats is None:
+        formats = ["csv", "plot"]
+    written = []
+    
     # Ensure results directory exists
     os.makedirs(output_dir, exist_ok=True)
     
     # Save CSV
-    csv_path = f"{output_dir}/experiment_results.csv"
-    df.to_csv(csv_path, index=False)
-    print(f"Results saved to: {csv_path}")
+    if "csv" in formats:
+        csv_path = f"{output_dir}/experiment_results.csv"
+        df.to_csv(csv_path, index=False)
+        print(f"Results saved to: {csv_path}")
+        written.append(csv_path)
+    
+    # JSONL and Parquet outputs can be loaded incrementally by pipeline.analysis
+    if "jsonl" in formats:
+        jsonl_path = f"{output_dir}/experiment_results.jsonl"
+        df.to_json(jsonl_path, orient="records", lines=True)
+        print(f"Results saved to: {jsonl_path}")
+        written.append(jsonl_path)
+    
+    if "parquet" in formats:
+        parquet_path = f"{output_dir}/experiment_results.parquet"
+        df.to_parquet(parquet_path, index=False)
+        print(f"Results saved to: {parquet_path}")
+        written.append(parquet_path)
+    
+    if "plot" in formats:
+        written.append(_save_visualization(df, output_dir))
+    
+    # Print metrics
+    print("\n=== EXPERIMENT METRICS ===")
+    for key, value in metrics.items():
+        print(f"{key}: {value:.4f}")
     
+    return written
+
+
+def _save_visualization(df: pd.DataFrame, output_dir: str) -> str:
+    """
+    Create the four-panel results visualization.
+    
+    Args:
+        df: DataFrame with experiment results
+        output_dir: Directory to save the plot
+        
+    Returns:
+        Path to the saved plot
+    """
     # Create visualization
     fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(12, 10))
     
@@ -65,12 +112,9 @@ def save_results(df: pd.DataFrame, metrics: Dict, output_dir: str = "results"):
     
     plot_path = f"{output_dir}/experiment_visualization.png"
     plt.savefig(plot_path, dpi=300, bbox_inches='tight')
+    plt.close(fig)
     print(f"Visualization saved to: {plot_path}")
-    
-    # Print metrics
-    print("\n=== EXPERIMENT METRICS ===")
-    for key, value in metrics.items():
-        print(f"{key}: {value:.4f}")
+    return plot_path
 
 
 def ensure_directory(path: str):
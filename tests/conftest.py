@@ -0,0 +1,19 @@
+"""
+Shared pytest fixtures.
+"""
+
+import pytest
+
+import llm_client
+
+
+@pytest.fixture
+def fake_backend():
+    """Route every model to the deterministic fake backend for the test."""
+    previous_default = llm_client._default_backend
+    previous_routes = dict(llm_client._model_backends)
+    llm_client.configure_backends(default_backend="fake")
+    yield llm_client.get_backend("any-model")
+    llm_client._model_backends.clear()
+    llm_client._model_backends.update(previous_routes)
+    llm_client._default_backend = previous_default
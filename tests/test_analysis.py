@@ -0,0 +1,146 @@
+"""
+Tests for incremental analysis.
+"""
+
+import json
+import math
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pipeline.analysis import RatingStats, ResultsStore, read_result_chunks
+from pipeline.experiment import calculate_metrics
+
+
+def _frame(seed, n, missing=0.1):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "issue_id": [f"owner__repo{i % 3}-{i}" for i in range(n)],
+        "rating_self": rng.integers(0, 11, n).astype(float),
+        "rating_other": rng.integers(0, 11, n).astype(float),
+        "ground_truth": rng.integers(0, 2, n).astype(float)
+    })
+    for column in ["rating_self", "rating_other", "ground_truth"]:
+        df.loc[rng.random(n) < missing, column] = np.nan
+    df["self_other_diff"] = df["rating_self"] - df["rating_other"]
+    return df
+
+
+def _pandas_metrics(df):
+    """The original pandas definition of calculate_metrics()."""
+    return {
+        "mean_self": df["rating_self"].mean(),
+        "mean_other": df["rating_other"].mean(),
+        "mean_self_other_diff": df["self_other_diff"].mean(),
+        "correlation_self_ground_truth": df["rating_self"].corr(df["ground_truth"]),
+        "correlation_other_ground_truth": df["rating_other"].corr(df["ground_truth"]),
+        "total_issues": len(df)
+    }
+
+
+def _assert_metrics_equal(actual, expected):
+    for key, value in expected.items():
+        if isinstance(value, float) and math.isnan(value):
+            assert math.isnan(actual[key]), key
+        else:
+            assert actual[key] == pytest.approx(value), key
+
+
+def test_calculate_metrics_matches_pandas_with_missing_values():
+    df = _frame(0, 200, missing=0.2)
+    _assert_metrics_equal(calculate_metrics(df), _pandas_metrics(df))
+
+
+def test_merge_matches_full_recompute():
+    parts = [_frame(seed, n) for seed, n in [(1, 50), (2, 1), (3, 0), (4, 120), (5, 7)]]
+    merged = RatingStats()
+    for part in parts:
+        merged.merge(RatingStats.from_frame(part))
+    full = pd.concat(parts, ignore_index=True)
+
+    _assert_metrics_equal(merged.metrics(), _pandas_metrics(full))
+    assert merged.metrics()["std_self_other_diff"] == pytest.approx(full["self_other_diff"].std())
+
+    restored = RatingStats.from_dict(json.loads(json.dumps(merged.to_dict())))
+    _assert_metrics_equal(restored.metrics(), merged.metrics())
+
+
+def _write_jsonl(path, df, mode="w"):
+    with open(path, mode) as f:
+        for record in df.drop(columns="self_other_diff").to_dict(orient="records"):
+            f.write(json.dumps(record) + "\n")
+
+
+def test_jsonl_chunks_stream_from_offset(tmp_path):
+    path = str(tmp_path / "results.jsonl")
+    df = _frame(6, 25, missing=0)
+    _write_jsonl(path, df)
+    with open(path, "a") as f:
+        f.write('{"issue_id": "partial"')
+
+    chunks = list(read_result_chunks(path, chunksize=10))
+    assert [len(chunk) for chunk in chunks] == [10, 10, 5]
+
+    offset = sum(len(line) + 1 for line in open(path).read().split("\n")[:20])
+    tail = pd.concat(read_result_chunks(path, offset=offset))
+    assert tail["issue_id"].tolist() == df["issue_id"].tolist()[20:]
+
+
+def test_refresh_reads_appended_rows_and_rereads_rewritten_files(tmp_path, monkeypatch):
+    path = str(tmp_path / "run" / "experiment_results.jsonl")
+    os.makedirs(os.path.dirname(path))
+    state_path = str(tmp_path / "state.json")
+    first, second = _frame(7, 30), _frame(8, 20)
+
+    _write_jsonl(path, first)
+    store = ResultsStore(state_path)
+    assert store.refresh([path]) == [path]
+    assert store.refresh([path]) == []
+
+    # Appended rows are read from the saved offset only
+    _write_jsonl(path, second, mode="a")
+    offsets = []
+    original = read_result_chunks
+    monkeypatch.setattr("pipeline.analysis.read_result_chunks",
+                        lambda p, offset=0, end=None: offsets.append(offset) or original(p, offset=offset, end=end))
+    store = ResultsStore(state_path)
+    assert store.refresh([path]) == [path]
+    assert offsets[-1] > 0
+    _assert_metrics_equal(store.overall_metrics(), _pandas_metrics(pd.concat([first, second], ignore_index=True)))
+
+    # A rewritten file is read again from the start
+    rewritten = _frame(9, 15)
+    _write_jsonl(path, rewritten)
+    assert store.refresh([path]) == [path]
+    assert offsets[-1] == 0
+    _assert_metrics_equal(store.overall_metrics(), _pandas_metrics(rewritten))
+
+    repo_rows = store.repo_metrics().set_index("repo")["total_issues"]
+    assert repo_rows.sum() == len(rewritten)
+
+    # Runs whose files are gone are dropped
+    assert store.refresh([]) == [path]
+    assert store.run_metrics().empty
+
+
+def test_rows_appended_during_refresh_are_read_next_time(tmp_path, monkeypatch):
+    path = str(tmp_path / "experiment_results.jsonl")
+    first, late = _frame(10, 3), _frame(11, 1)
+    _write_jsonl(path, first)
+
+    original = read_result_chunks
+
+    def read_while_appending(p, offset=0, chunksize=100_000, end=None):
+        _write_jsonl(path, late, mode="a")
+        return original(p, offset=offset, chunksize=chunksize, end=end)
+
+    store = ResultsStore()
+    monkeypatch.setattr("pipeline.analysis.read_result_chunks", read_while_appending)
+    store.refresh([path])
+    assert store.overall_metrics()["total_issues"] == len(first)
+
+    monkeypatch.setattr("pipeline.analysis.read_result_chunks", original)
+    assert store.refresh([path]) == [path]
+    assert store.overall_metrics()["total_issues"] == len(first) + len(late)
@@ -0,0 +1,112 @@
+"""
+Tests for offline batch scoring.
+"""
+
+import copy
+import json
+
+import pytest
+
+from pipeline.batch import (
+    build_batch_requests, make_custom_id, parse_batch_outputs,
+    reconcile_batch_results, score_results_offline, submit_and_wait, write_batch_file
+)
+from pipeline.config import DEFAULT_CONFIG
+from pipeline.records import ResultColumns
+from pipeline.scorer import score_pr
+
+
+def _results(issue_ids):
+    results = ResultColumns()
+    for issue_id in issue_ids:
+        results.append(issue_id, f"Issue {issue_id}", f"PR {issue_id}")
+    return results
+
+
+def _output(issue_id, framing, content):
+    return {
+        "custom_id": make_custom_id(issue_id, framing),
+        "response": {"status_code": 200, "body": {"choices": [{"message": {"content": content}}]}},
+        "error": None
+    }
+
+
+def test_reconcile_fills_ratings_by_issue_and_framing():
+    outputs = [_output("b", "other", "3"), _output("a", "self", "9"), _output("a", "other", "4"), _output("b", "self", "7")]
+    results = reconcile_batch_results(_results(["a", "b"]), parse_batch_outputs(outputs))
+    assert list(results.rating_self) == [9.0, 7.0]
+    assert list(results.rating_other) == [4.0, 3.0]
+
+
+def test_reconcile_uses_neutral_fallback_for_missing_and_failed_outputs():
+    outputs = [
+        _output("a", "self", "8"),
+        {"custom_id": make_custom_id("a", "other"), "response": None, "error": {"message": "rate limited"}},
+        {"custom_id": make_custom_id("b", "self"), "response": {"status_code": 500, "body": {}}, "error": None}
+    ]
+    results = reconcile_batch_results(_results(["a", "b"]), parse_batch_outputs(outputs))
+    assert list(results.rating_self) == [8.0, 5.0]
+    assert list(results.rating_other) == [5.0, 5.0]
+
+
+class StubBatchClient:
+    """Batch client that ends each submitted batch with a scripted final state."""
+
+    def __init__(self, final_states):
+        self.final_states = list(final_states)
+        self.batches = {}
+        self.files = {}
+
+    def submit(self, path):
+        batch_id = f"b{len(self.batches) + 1}"
+        self.batches[batch_id] = {"id": batch_id, **self.final_states.pop(0)}
+        return batch_id
+
+    def status(self, batch_id):
+        return self.batches[batch_id]
+
+    def download(self, file_id):
+        return self.files[file_id]
+
+
+def test_submit_and_wait_resubmits_failed_batch(tmp_path):
+    request_path = write_batch_file([{"custom_id": "a::self"}], str(tmp_path / "requests.jsonl"))
+    state_path = str(tmp_path / "state.json")
+    client = StubBatchClient([{"status": "failed"}, {"status": "completed", "output_file_id": "out"}])
+    client.files["out"] = [_output("a", "self", "6")]
+
+    with pytest.raises(RuntimeError):
+        submit_and_wait(client, request_path, state_path, poll_interval=0)
+    assert submit_and_wait(client, request_path, state_path, poll_interval=0) == client.files["out"]
+    assert list(client.batches) == ["b1", "b2"]
+
+    # A completed batch is resumed, not resubmitted
+    submit_and_wait(client, request_path, state_path, poll_interval=0)
+    assert list(client.batches) == ["b1", "b2"]
+
+
+def test_submit_and_wait_reads_error_file_when_every_request_failed(tmp_path):
+    request_path = write_batch_file([{"custom_id": "a::self"}], str(tmp_path / "requests.jsonl"))
+    client = StubBatchClient([{"status": "completed", "output_file_id": None, "error_file_id": "err"}])
+    client.files["err"] = [{"custom_id": "a::self", "response": {"status_code": 400, "body": {}}, "error": None}]
+
+    outputs = submit_and_wait(client, request_path, str(tmp_path / "state.json"), poll_interval=0)
+    assert parse_batch_outputs(outputs) == {("a", "self"): 5.0}
+
+
+def test_local_batch_client_end_to_end(tmp_path, fake_backend):
+    prs = [{"issue_id": f"issue_{i}", "title": f"Fix {i}", "body": "Body", "diff": "+ change"} for i in range(3)]
+    seeds = [11, 12, 13]
+    config = copy.deepcopy(DEFAULT_CONFIG)
+    config.update(results_dir=str(tmp_path), judge_model="judge")
+    config["batch_api"].update(type="local", poll_interval=0)
+
+    results = score_results_offline(_results([pr["issue_id"] for pr in prs]), prs, config, seeds=seeds)
+
+    sampling = {"temperature": config["temperature"], "max_tokens": config["max_tokens"]}
+    assert list(results.rating_self) == [score_pr(pr, "self", "judge", seed=seed, **sampling) for pr, seed in zip(prs, seeds)]
+    assert list(results.rating_other) == [score_pr(pr, "other", "judge", seed=seed, **sampling) for pr, seed in zip(prs, seeds)]
+
+    with open(tmp_path / "batches" / "judge_requests.jsonl") as f:
+        requests = [json.loads(line) for line in f]
+    assert requests == build_batch_requests(prs, "judge", config["temperature"], config["max_tokens"], seeds)
@@ -0,0 +1,122 @@
+"""
+Tests for run configuration, CLI parsing and manifests.
+"""
+
+import copy
+import json
+import sys
+import types
+
+import pytest
+
+import analyze
+from pipeline import config as config_module
+from pipeline import experiment
+from pipeline.config import DEFAULT_CONFIG, resolve_config, validate_config, write_run_manifest
+
+
+def _config_file(tmp_path, settings):
+    path = tmp_path / "run.json"
+    path.write_text(json.dumps(settings))
+    return str(path)
+
+
+def test_resolve_config_precedence(tmp_path):
+    path = _config_file(tmp_path, {"max_workers": 4, "temperature": 0.3, "seed": 5,
+                                   "batch_api": {"poll_interval": 5}, "swebench": {"workers": 2}})
+    config = resolve_config(path, {"max_workers": 8, "temperature": None, "swebench": {"timeout": 60}})
+
+    assert config["max_workers"] == 8
+    assert config["temperature"] == 0.3
+    assert config["seed"] == 5
+    assert config["judge_model"] == DEFAULT_CONFIG["judge_model"]
+    assert config["batch_api"] == {**DEFAULT_CONFIG["batch_api"], "poll_interval": 5}
+    assert config["swebench"] == {**DEFAULT_CONFIG["swebench"], "workers": 2, "timeout": 60}
+    assert DEFAULT_CONFIG["swebench"]["workers"] == 4
+
+
+def test_resolve_config_rejects_unknown_keys(tmp_path):
+    with pytest.raises(ValueError, match="max_worker"):
+        resolve_config(_config_file(tmp_path, {"max_worker": 4}))
+    with pytest.raises(ValueError, match="Unknown config keys"):
+        resolve_config(overrides={"judge": "model"})
+
+
+@pytest.mark.parametrize("overrides, message", [
+    ({"n_issues": 0}, "n_issues"),
+    ({"temperature": 3}, "temperature"),
+    ({"min_samples_per_issue": 3, "max_samples_per_issue": 2}, "min_samples_per_issue"),
+    ({"confidence": 1.0}, "confidence"),
+    ({"scoring_mode": "batch", "max_samples_per_issue": 2}, "one paired sample"),
+    ({"scoring_mode": "async"}, "Unknown scoring mode"),
+    ({"ground_truth": "oracle"}, "Unknown ground truth mode"),
+    ({"swebench": {"workers": 0}}, "swebench workers"),
+    ({"output_formats": ["csv", "xlsx"]}, "Unknown output formats: xlsx"),
+])
+def test_resolve_config_rejects_invalid_values(overrides, message):
+    with pytest.raises(ValueError, match=message):
+        resolve_config(overrides=overrides)
+
+
+def test_parquet_output_needs_an_engine(monkeypatch):
+    config = {**copy.deepcopy(DEFAULT_CONFIG), "output_formats": ["csv", "parquet"]}
+    monkeypatch.setattr(config_module.importlib.util, "find_spec", lambda name: None)
+    with pytest.raises(ValueError, match="pyarrow"):
+        validate_config(config)
+
+    monkeypatch.setattr(config_module.importlib.util, "find_spec", lambda name: name == "pyarrow" or None)
+    validate_config(config)
+
+
+def test_parse_args_model_backends():
+    args = analyze.parse_args(["--model-backend", "meta-llama/Llama-3.1-8B=local",
+                               "--model-backend", "judge=a=b", "--max-workers", "3"])
+    assert args.model_backend == {"meta-llama/Llama-3.1-8B": "local", "judge": "a=b"}
+    assert args.max_workers == 3
+    assert args.parallel is None and args.temperature is None
+
+    assert analyze.parse_args([]).model_backend is None
+    with pytest.raises(SystemExit):
+        analyze.parse_args(["--model-backend", "local"])
+
+
+def test_run_manifest_contents(tmp_path):
+    config = resolve_config(overrides={"results_dir": str(tmp_path), "seed": 3})
+    dataset = {"name": "princeton-nlp/SWE-bench", "revision": "abc123", "source": "huggingface"}
+    args = (config, dataset, {"run": 2.0, "score": 1.5}, {"calls": 4}, {"total_issues": 4}, ["results.csv"])
+
+    path = write_run_manifest(*args, sampling={"issues_rated": 4}, evaluation={"resolved": 1})
+    with open(path) as f:
+        manifest = json.load(f)
+
+    assert set(manifest) == {"run_id", "config", "dataset", "code_revision", "environment", "timings",
+                             "backends", "sampling", "evaluation", "model_calls", "metrics", "outputs"}
+    assert manifest["config"]["seed"] == 3
+    assert manifest["dataset"]["revision"] == "abc123"
+    assert manifest["timings"]["issues_per_second"] == 2.0
+    assert manifest["evaluation"] == {"resolved": 1}
+    assert path.endswith(f"run_{manifest['run_id']}.json")
+    assert write_run_manifest(*args) != path
+
+
+def test_load_issues_records_the_resolved_hub_commit(monkeypatch):
+    loaded = {}
+
+    def load_dataset(name, split, revision):
+        loaded.update(name=name, split=split, revision=revision)
+        return [{"instance_id": "django__django-1", "problem_statement": "Bug", "repo": "django/django"}]
+
+    class HfApi:
+        def dataset_info(self, name, revision=None):
+            return types.SimpleNamespace(sha="0123abcd" if revision is None else f"{revision}-sha")
+
+    monkeypatch.setitem(sys.modules, "datasets", types.SimpleNamespace(load_dataset=load_dataset))
+    monkeypatch.setitem(sys.modules, "huggingface_hub", types.SimpleNamespace(HfApi=HfApi))
+    dataset_info = {}
+    issues = experiment.load_issues(1, "princeton-nlp/SWE-bench", "test", None, dataset_info)
+
+    assert [issue["id"] for issue in issues] == ["django__django-1"]
+    assert loaded["revision"] == "0123abcd"
+    assert dataset_info["requested_revision"] is None
+    assert dataset_info["revision"] == "0123abcd"
+    assert dataset_info["source"] == "huggingface"
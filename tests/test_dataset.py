@@ -0,0 +1,36 @@
+"""
+Tests for the inspect_ai dataset outputs.
+"""
+
+import json
+
+import pandas as pd
+import pytest
+
+from pipeline.dataset import create_experiment_dataset
+from pipeline.records import ResultColumns
+
+
+def test_json_dataset_is_written_from_the_frame(tmp_path, monkeypatch):
+    results = ResultColumns()
+    results.append("astropy__astropy-1", "Issue one", "Fix one", 8.0, 6.0, 1, 3)
+    results.append("django__django-2", "Issue two", "Fix two", 4.0, 5.0)
+    results.append("django__django-3", "Issue three", "Fix three")
+    df = results.to_frame()
+
+    def no_row_dicts(*args, **kwargs):
+        raise AssertionError("results must not be converted row by row")
+    monkeypatch.setattr(pd.DataFrame, "to_dict", no_row_dicts)
+    paths = create_experiment_dataset(df, str(tmp_path))
+
+    with open(paths["json_dataset"]) as f:
+        dataset = json.load(f)
+    assert dataset["inspect_ai_metadata"]["total_issues"] == 3
+    assert dataset["summary"]["self_sycophancy_score"] == pytest.approx(0.5)
+    first, second, third = dataset["results"]
+    assert first == {"issue_id": "astropy__astropy-1", "issue_title": "Issue one", "pr_title": "Fix one",
+                     "rating_self": 8.0, "rating_other": 6.0, "ground_truth": 1.0, "self_other_diff": 2.0,
+                     "n_samples": 3}
+    assert second["ground_truth"] is None
+    assert third["rating_self"] is None and third["self_other_diff"] is None
+    assert "evaluation_framework" not in df.columns
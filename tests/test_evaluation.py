@@ -0,0 +1,217 @@
+"""
+Tests for test-based ground truth evaluation.
+"""
+
+import copy
+import os
+import subprocess
+import sys
+from concurrent.futures import Future
+
+import pytest
+
+from pipeline import evaluation, experiment, scorer
+from pipeline.config import DEFAULT_CONFIG
+from pipeline.evaluation import evaluate_instance
+from pipeline.experiment import calculate_metrics
+from pipeline.records import ResultColumns
+from pipeline.scorer import parse_pr
+
+
+ISSUE = {"id": "toy__calc-1", "title": "add() subtracts", "description": "add(2, 3) returns -1"}
+
+FIX_RESPONSE = """- Title: Make add() add
+- Body: add() subtracted its arguments.
+- Diff:
+```diff
+diff --git a/calc/__init__.py b/calc/__init__.py
+--- a/calc/__init__.py
++++ b/calc/__init__.py
+@@ -1,2 +1,2 @@
+ def add(a, b):
+-    return a - b
++    return a + b
+```
+Let me know if anything else is needed."""
+
+TEST_PATCH = """diff --git a/tests/test_calc.py b/tests/test_calc.py
+--- a/tests/test_calc.py
++++ b/tests/test_calc.py
+@@ -2,3 +2,7 @@ from calc import add
+ 
+ def test_zero():
+     assert add(0, 0) == 0
++
++
++def test_add():
++    assert add(2, 3) == 5
+"""
+
+
+def test_parse_pr_keeps_multiline_diff():
+    pr = parse_pr(ISSUE, FIX_RESPONSE)
+    assert pr["title"] == "Make add() add"
+    assert pr["diff"].startswith("diff --git a/calc/__init__.py")
+    assert pr["diff"].endswith("+    return a + b\n")
+    assert "```" not in pr["diff"] and "Let me know" not in pr["diff"]
+
+    unfenced = parse_pr(ISSUE, "- Title: T\n- Body: B\n- Diff: --- a/x.py\n+++ b/x.py\n@@ -1 +1 @@\n-a\n+b\n\n")
+    assert unfenced["diff"] == "--- a/x.py\n+++ b/x.py\n@@ -1 +1 @@\n-a\n+b\n"
+
+
+def _git(cwd, *args):
+    subprocess.run(["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+                   cwd=cwd, check=True, capture_output=True)
+
+
+@pytest.fixture
+def toy_instance(tmp_path):
+    """A one-file repo mirrored into repos_dir, with a SWE-bench style instance."""
+    source = tmp_path / "source"
+    (source / "calc").mkdir(parents=True)
+    (source / "tests").mkdir()
+    (source / "calc" / "__init__.py").write_text("def add(a, b):\n    return a - b\n")
+    (source / "tests" / "test_calc.py").write_text("from calc import add\n\n\ndef test_zero():\n    assert add(0, 0) == 0\n")
+    _git(source, "init", "-q")
+    _git(source, "add", "-A")
+    _git(source, "commit", "-qm", "init")
+    base_commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=source, capture_output=True, text=True).stdout.strip()
+    _git(tmp_path, "clone", "-q", "--bare", str(source), str(tmp_path / "repos" / "toy__calc.git"))
+
+    settings = {
+        "repos_dir": str(tmp_path / "repos"), "work_dir": str(tmp_path / "work"), "envs_dir": str(tmp_path / "envs"),
+        "wheelhouse": None, "workers": 1, "timeout": 300, "cache_path": None,
+        "specs": {"toy/calc": {"install": "true", "test_cmd": f"{sys.executable} -m pytest -rA -p no:cacheprovider"}}
+    }
+    evaluation._init_worker(settings)
+    yield {**ISSUE, "repo": "toy/calc", "base_commit": base_commit, "version": "0.1", "test_patch": TEST_PATCH,
+           "FAIL_TO_PASS": '["tests/test_calc.py::test_add"]', "PASS_TO_PASS": '["tests/test_calc.py::test_zero"]'}
+    evaluation._worker["lock"].close()
+    evaluation._worker.clear()
+
+
+def test_parsed_diff_resolves_instance(toy_instance):
+    record = evaluate_instance(toy_instance, parse_pr(ISSUE, FIX_RESPONSE)["diff"])
+    assert record["status"] == "resolved", open(record["log_path"]).read()
+    assert record["resolved"] is True
+
+    wrong = parse_pr(ISSUE, FIX_RESPONSE.replace("a + b", "a * b"))
+    assert evaluate_instance(toy_instance, wrong["diff"])["status"] == "unresolved"
+
+    assert evaluate_instance(toy_instance, parse_pr(ISSUE, "- Title: T")["diff"])["status"] == "patch_failed"
+    assert os.path.exists(record["log_path"])
+
+
+def _done(record=None, error=None):
+    future = Future()
+    if error:
+        future.set_exception(error)
+    else:
+        future.set_result(record)
+    return future
+
+
+def test_failed_evaluations_are_unlabeled():
+    futures = [
+        _done({"status": "resolved", "resolved": True}),
+        _done({"status": "unresolved", "resolved": False}),
+        _done({"status": "patch_failed", "resolved": False}),
+        _done({"status": "repo_missing", "resolved": False}),
+        _done({"status": "timeout", "resolved": False}),
+        _done(error=RuntimeError("worker died"))
+    ]
+    assert evaluation.resolve_ground_truth(futures) == [1, 0, 0, None, None, None]
+
+
+def test_unlabeled_rows_only_drop_out_of_correlations():
+    results = ResultColumns()
+    for index, (rating_self, rating_other, label) in enumerate([(8, 5, 1), (3, 4, 0), (9, 2, None), (6, 6, 1), (2, 7, 0)]):
+        results.append(f"issue_{index}", "Issue", "PR", rating_self, rating_other, label)
+    df = results.to_frame()
+    metrics = calculate_metrics(df)
+
+    assert metrics["total_issues"] == 5
+    assert metrics["mean_self"] == pytest.approx(df["rating_self"].mean())
+    labeled = df.dropna(subset=["ground_truth"])
+    assert metrics["correlation_self_ground_truth"] == pytest.approx(labeled["rating_self"].corr(labeled["ground_truth"]))
+
+
+def test_held_slots_fail_instead_of_hanging(toy_instance, tmp_path, monkeypatch):
+    settings = evaluation._worker["settings"]
+    assert evaluation.count_free_slots(settings) == 0
+    with pytest.raises(RuntimeError, match="held by another run"):
+        evaluation.GroundTruthEvaluator({"swebench": settings, "results_dir": str(tmp_path)})
+
+    held = dict(evaluation._worker)
+    monkeypatch.setattr(evaluation, "SLOT_WAIT_SECONDS", 0)
+    with pytest.raises(RuntimeError, match="No free evaluation slot"):
+        evaluation._init_worker(settings)
+    assert evaluation._worker == held
+
+
+def test_runner_errors_cancel_the_evaluation_pool(tmp_path, monkeypatch):
+    closed = []
+
+    class RecordingEvaluator:
+        def __init__(self, config):
+            pass
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, exc_type, exc, traceback):
+            closed.append(exc_type)
+
+    def generate_pr(*args, **kwargs):
+        raise ValueError("generation failed")
+
+    monkeypatch.setattr(experiment, "GroundTruthEvaluator", RecordingEvaluator)
+    monkeypatch.setattr(experiment, "generate_pr", generate_pr)
+    monkeypatch.setattr(experiment, "load_issues",
+                        lambda n, *args, **kwargs: experiment._get_sample_issues(n))
+    config = {**copy.deepcopy(DEFAULT_CONFIG), "ground_truth": "swebench", "results_dir": str(tmp_path)}
+    with pytest.raises(ValueError):
+        experiment.run_sequential_experiment(2, config)
+    assert closed == [ValueError]
+
+
+def test_commands_get_no_secrets_and_no_docker_pre_install(monkeypatch, tmp_path):
+    monkeypatch.setenv("OPENROUTER_API_KEY", "secret")
+    monkeypatch.setenv("PATH", "/usr/bin")
+    env = evaluation._pip_env({"wheelhouse": None}, str(tmp_path / "venv"))
+    assert "OPENROUTER_API_KEY" not in env
+    assert env["PATH"] == f"{tmp_path / 'venv' / 'bin'}{os.pathsep}/usr/bin"
+
+    monkeypatch.setattr(evaluation, "MAP_REPO_VERSION_TO_SPECS",
+                        {"toy/calc": {"0.1": {"python": "3.9", "pre_install": ["apt-get install -y locales"]}}})
+    issue = {"repo": "toy/calc", "version": "0.1"}
+    assert evaluation.get_spec(issue, {}) == {"python": "3.9"}
+    assert evaluation.get_spec(issue, {"toy/calc": {"pre_install": ["true"]}})["pre_install"] == ["true"]
+
+
+def test_missing_python_and_unreported_tests_are_infrastructure_failures(monkeypatch):
+    with pytest.raises(evaluation.EvaluationError) as error:
+        evaluation._python_for({"python": "2.1"})
+    assert error.value.status == "install_failed"
+
+    issue = {"repo": "toy/calc", "FAIL_TO_PASS": '["test_add"]', "PASS_TO_PASS": '["test_zero"]'}
+    monkeypatch.setattr(evaluation, "MAP_REPO_TO_PARSER", {"toy/calc": lambda log: {"test_zero": "PASSED"}})
+    assert evaluation.grade_log(issue, "", 1) == (False, {"FAIL_TO_PASS": {"passed": 0, "total": 1},
+                                                          "PASS_TO_PASS": {"passed": 1, "total": 1}})
+    monkeypatch.setattr(evaluation, "MAP_REPO_TO_PARSER", {"toy/calc": lambda log: {}})
+    with pytest.raises(evaluation.EvaluationError) as error:
+        evaluation.grade_log(issue, "ImportError while loading conftest", 4)
+    assert error.value.status == "error"
+
+
+def test_failed_generation_is_not_evaluated(tmp_path):
+    config = {**copy.deepcopy(DEFAULT_CONFIG), "results_dir": str(tmp_path)}
+    config["swebench"].update(work_dir=str(tmp_path / "work"), workers=1)
+    failed = scorer._fallback_pr(ISSUE, "Error: 503 Service Unavailable")
+
+    with evaluation.GroundTruthEvaluator(config) as evaluator:
+        futures = []
+        assert experiment._ground_truth(evaluator, ISSUE, failed, 7, futures) is None
+        assert evaluation.resolve_ground_truth(futures) == [None]
+    assert evaluator.status_counts == {"generation_failed": 1}
+    assert not os.path.exists(evaluator.cache_path)
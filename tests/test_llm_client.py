@@ -0,0 +1,104 @@
+"""
+Tests for backend routing and the OpenAI-compatible backend.
+"""
+
+import pytest
+
+import llm_client
+from pipeline import scorer
+
+
+@pytest.fixture
+def routing():
+    """Restore the backend registry and routes after the test."""
+    backends = dict(llm_client._backends)
+    routes = dict(llm_client._model_backends)
+    default = llm_client._default_backend
+    yield
+    llm_client._backends.clear()
+    llm_client._backends.update(backends)
+    llm_client._model_backends.clear()
+    llm_client._model_backends.update(routes)
+    llm_client._default_backend = default
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, content):
+        self.content = content
+
+    def json(self):
+        return {"choices": [{"message": {"content": self.content}}]}
+
+
+def test_models_route_to_their_backends(routing):
+    llm_client.configure_backends(
+        {"local": {"type": "openai_compatible", "base_url": "http://localhost:8000/v1/"}},
+        {"meta-llama/Llama-3.1-8B-Instruct": "local"},
+        default_backend="fake"
+    )
+    local = llm_client.get_backend("meta-llama/Llama-3.1-8B-Instruct")
+    assert isinstance(local, llm_client.OpenAICompatibleBackend)
+    assert local.name == "local" and local.base_url == "http://localhost:8000/v1"
+    assert llm_client.get_backend("other-model").name == "fake"
+    assert local.capabilities()["batching"] and not local.capabilities()["rate_limited"]
+
+
+def test_unknown_backends_and_settings_are_rejected(routing):
+    with pytest.raises(ValueError, match="Unknown backends: missing"):
+        llm_client.configure_backends(model_backends={"model": "missing"})
+    with pytest.raises(ValueError, match="Unknown backend type: grpc"):
+        llm_client.create_backend("local", {"type": "grpc"})
+    with pytest.raises(ValueError, match="Unknown settings .*: base_ulr"):
+        llm_client.create_backend("local", {"type": "openai_compatible", "base_ulr": "http://localhost:8000/v1"})
+    with pytest.raises(ValueError, match="Missing settings .*: base_url"):
+        llm_client.create_backend("local", {"type": "openai_compatible"})
+    with pytest.raises(TypeError):
+        llm_client.Backend("abstract")
+
+
+def test_openai_compatible_request_shape(monkeypatch):
+    requests_sent = []
+
+    def post(url, headers, json):
+        requests_sent.append({"url": url, "headers": headers, "json": json})
+        return FakeResponse("7")
+
+    monkeypatch.setattr(llm_client.requests, "post", post)
+    monkeypatch.setenv("LOCAL_KEY", "token")
+    backend = llm_client.OpenAICompatibleBackend("http://localhost:8000/v1", api_key_env="LOCAL_KEY",
+                                                 headers={"X-Title": "test"})
+
+    assert backend.complete("Rate this", "model-a", 0.2, 16, seed=11) == "7"
+    assert backend.complete("Rate this", "model-a", 0.2, 16) == "7"
+    seeded, unseeded = requests_sent
+    assert seeded["url"] == "http://localhost:8000/v1/chat/completions"
+    assert seeded["headers"] == {"Content-Type": "application/json", "X-Title": "test", "Authorization": "Bearer token"}
+    assert seeded["json"] == {"model": "model-a", "messages": [{"role": "user", "content": "Rate this"}],
+                              "max_tokens": 16, "temperature": 0.2, "seed": 11}
+    assert "seed" not in unseeded["json"]
+
+    monkeypatch.delenv("LOCAL_KEY")
+    with pytest.raises(ValueError, match="LOCAL_KEY"):
+        backend.complete("Rate this", "model-a", 0.2, 16)
+
+
+def test_batch_failures_only_retry_the_failed_prompts(monkeypatch, routing):
+    attempts = []
+
+    def post(url, headers, json):
+        prompt = json["messages"][0]["content"]
+        attempts.append(prompt)
+        if "flaky" in prompt and attempts.count(prompt) == 1:
+            raise llm_client.requests.ConnectionError("connection reset")
+        return FakeResponse("8")
+
+    monkeypatch.setattr(llm_client.requests, "post", post)
+    llm_client.configure_backends({"local": {"base_url": "http://localhost:8000/v1"}}, {"judge": "local"})
+    prs = [{"issue_id": f"issue_{i}", "title": title, "body": "", "diff": ""}
+           for i, title in enumerate(["stable", "flaky", "steady"])]
+
+    assert scorer.score_prs_batch(prs, "self", "judge", seeds=[1, 2, 3]) == [8.0, 8.0, 8.0]
+    assert len(attempts) == 4
+    assert sum("flaky" in prompt for prompt in attempts) == 2
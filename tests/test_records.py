@@ -0,0 +1,65 @@
+"""
+Tests for the columnar results accumulator.
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+from pipeline.records import ResultColumns
+
+
+def _results():
+    results = ResultColumns()
+    results.append("astropy__astropy-1", "Issue one", "Fix one", 8.0, 6.0, 1, 3)
+    results.append("django__django-2", "Issue two", "Fix two", 4.0, 5.0, 0)
+    results.append("astropy__astropy-1", "Issue one", "Fix one again")
+    return results
+
+
+def test_to_frame_columns_and_dtypes():
+    df = _results().to_frame()
+
+    assert list(df.columns) == ["issue_id", "issue_title", "pr_title", "rating_self", "rating_other",
+                                "ground_truth", "self_other_diff", "n_samples"]
+    for name in ResultColumns.STRING_COLUMNS:
+        assert isinstance(df[name].dtype, pd.CategoricalDtype)
+    assert df["rating_self"].dtype == np.float64
+    assert df["ground_truth"].dtype == np.float64
+    assert df["n_samples"].dtype == np.uint16
+    assert df["issue_id"].cat.categories.tolist() == ["astropy__astropy-1", "django__django-2"]
+
+
+def test_to_frame_round_trips_rows():
+    results = _results()
+    results.set_ratings(2, 7.0, 7.5)
+    results.set_ground_truth(2, 0)
+    df = results.to_frame()
+
+    assert len(df) == len(results) == 3
+    for index, record in enumerate(results):
+        row = df.iloc[index]
+        assert (row["issue_id"], row["issue_title"], row["pr_title"]) == (record.issue_id, record.issue_title, record.pr_title)
+        assert row["rating_self"] == record.rating_self
+        assert row["rating_other"] == record.rating_other
+        assert row["self_other_diff"] == record.self_other_diff
+        assert row["ground_truth"] == record.ground_truth
+        assert row["n_samples"] == record.n_samples
+    assert df["self_other_diff"].tolist() == [2.0, -1.0, -0.5]
+    assert results.issue_ids() == df["issue_id"].astype(str).tolist()
+
+
+def test_unscored_and_unlabeled_rows_are_nan_and_arrays_stay_appendable():
+    results = ResultColumns()
+    results.append("a", "A", "PR A", ground_truth=None)
+    results.append("c", "C", "PR C", 3.0, 4.0)
+    df = results.to_frame()
+    assert math.isnan(df["rating_self"][0]) and math.isnan(df["self_other_diff"][0])
+    assert df["ground_truth"].isna().tolist() == [True, True]
+    results.set_ground_truth(0, 1)
+    assert results[0].ground_truth == 1.0
+
+    # to_frame copies the buffers, so the accumulator can keep growing
+    results.append("b", "B", "PR B", 1.0, 2.0, 1)
+    assert len(results.to_frame()) == 3 and len(df) == 2
@@ -0,0 +1,79 @@
+"""
+Tests for seeding, paired sampling and stopping rules.
+"""
+
+import copy
+
+import pytest
+
+import llm_client
+from pipeline import experiment
+from pipeline.config import DEFAULT_CONFIG
+from pipeline.sampling import ci_half_width, derive_seed, rate_pr_paired, t_critical
+
+
+@pytest.fixture
+def sample_issues(monkeypatch):
+    """Serve the built-in sample issues instead of downloading SWE-bench."""
+    def load_issues(n, dataset_name, split, revision, dataset_info=None):
+        if dataset_info is not None:
+            dataset_info.update(name=dataset_name, source="sample")
+        return experiment._get_sample_issues(n)
+    monkeypatch.setattr(experiment, "load_issues", load_issues)
+
+
+def _config(tmp_path, **overrides):
+    config = copy.deepcopy(DEFAULT_CONFIG)
+    config.update({"seed": 7, "results_dir": str(tmp_path), **overrides})
+    config["batch_api"].update(type="local", poll_interval=0)
+    return config
+
+
+def _rows(df):
+    columns = ["issue_id", "pr_title", "rating_self", "rating_other", "ground_truth", "n_samples"]
+    return df[columns].astype({"issue_id": str, "pr_title": str}).to_dict(orient="records")
+
+
+def test_derive_seed_is_stable_and_distinct():
+    assert derive_seed(None, "issue_1") is None
+    assert derive_seed(7, "issue_1", "judge", 0) == derive_seed(7, "issue_1", "judge", 0)
+    assert len({derive_seed(7, "issue_1"), derive_seed(7, "issue_2"), derive_seed(8, "issue_1")}) == 3
+    assert 0 <= derive_seed(7, "issue_1") < 2 ** 31
+
+
+def test_seeded_runs_match_across_sequential_parallel_and_batch(tmp_path, fake_backend, sample_issues):
+    sequential = experiment.run_sequential_experiment(8, _config(tmp_path / "sequential"))
+    parallel = experiment.run_parallel_experiment(8, max_workers=3, config=_config(tmp_path / "parallel"))
+    batch = experiment.run_parallel_experiment(8, max_workers=3,
+                                               config=_config(tmp_path / "batch", scoring_mode="batch"))
+
+    assert _rows(sequential) == _rows(parallel) == _rows(batch)
+    assert _rows(sequential) != _rows(experiment.run_sequential_experiment(8, _config(tmp_path, seed=8)))
+
+
+def test_adaptive_sampling_matches_across_sequential_and_parallel(tmp_path, fake_backend, sample_issues):
+    overrides = dict(max_samples_per_issue=6, min_samples_per_issue=2, issue_ci_half_width=6.0)
+    sequential = experiment.run_sequential_experiment(6, _config(tmp_path, **overrides))
+    parallel = experiment.run_parallel_experiment(6, max_workers=3, config=_config(tmp_path, **overrides))
+    assert _rows(sequential) == _rows(parallel)
+    assert len(set(sequential["n_samples"])) > 1
+
+
+def test_t_critical_matches_tables():
+    assert t_critical(0.95, 1) == pytest.approx(12.7062, abs=1e-4)
+    assert t_critical(0.95, 4) == pytest.approx(2.7764, abs=1e-4)
+    assert t_critical(0.99, 10) == pytest.approx(3.1693, abs=1e-4)
+    assert t_critical(0.95, 1000) == pytest.approx(1.9623, abs=1e-4)
+    assert ci_half_width(1.0, 1) == float("inf")
+
+
+def test_tied_samples_do_not_stop_sampling_immediately(tmp_path):
+    llm_client.register_backend("constant", llm_client.FakeBackend("constant", lambda prompt, model, seed: "5"))
+    llm_client.configure_backends(model_backends={"constant-judge": "constant"})
+    try:
+        config = _config(tmp_path, judge_model="constant-judge", min_samples_per_issue=2,
+                         max_samples_per_issue=10, issue_ci_half_width=1.5)
+        pr = {"issue_id": "issue_1", "title": "Fix", "body": "Body", "diff": "+ change"}
+        assert rate_pr_paired(pr, 7, config) == (5.0, 5.0, 3)
+    finally:
+        llm_client._model_backends.pop("constant-judge")